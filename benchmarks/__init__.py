@@ -0,0 +1 @@
+# Benchmarks offline do painel com dados sintéticos (python -m benchmarks.executar)
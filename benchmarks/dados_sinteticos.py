@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cocada.fontes import LATITUDE_MAX, LATITUDE_MIN, LONGITUDE_MAX, LONGITUDE_MIN
+
+
+# ======================================================================
+# GERADOR DE DADOS SINTÉTICOS NO FORMATO DA SMTR
+# ======================================================================
+# Gera uma pasta no formato da FonteLocal (resumo/ e gps/ em Parquet) com o
+# mesmo esquema da tabela_resumo e dos pontos de GPS do BigQuery. Os
+# arquivos são gravados em partes de TAMANHO_PARTE linhas, então mesmo os
+# tamanhos grandes (10⁷) não precisam caber inteiros em memória.
+
+TAMANHO_PARTE = 1_000_000
+DATA_INICIAL = "2025-01-01"
+
+
+def nomes_linhas(quantidade, rng):
+    # Linhas de ônibus com três ou quatro dígitos, como 321, 945, 2345
+    numeros = rng.choice(np.arange(100, 100 + max(quantidade * 20, 1000)), quantidade, replace=False)
+    return np.sort(numeros).astype(str)
+
+
+def _partes(total):
+    inicio = 0
+    while inicio < total:
+        yield min(TAMANHO_PARTE, total - inicio)
+        inicio += TAMANHO_PARTE
+
+
+def _datas(rng, quantidade, dias):
+    return np.datetime64(DATA_INICIAL) + rng.integers(0, dias, quantidade).astype("timedelta64[D]")
+
+
+def parte_resumo(rng, linhas, quantidade, dias):
+    cluster = rng.integers(1, 5, quantidade)
+    # Clusters com perfis diferentes: quanto maior o cluster, mais tempo no
+    # Fundão e mais atrasos, como no modelo K-Means real
+    tempo = rng.gamma(3, 4 + 3 * cluster)
+    return pa.table({
+        "linha": pa.array(rng.choice(linhas, quantidade)),
+        "data": pa.array(_datas(rng, quantidade, dias).astype("datetime64[D]")),
+        "tempo_total_fundao": tempo,
+        "prop_atrasadas": np.clip(rng.beta(2, 6, quantidade) + 0.05 * cluster, 0, 1),
+        "velocidade_media_fundao": rng.uniform(5, 40, quantidade),
+        "cluster_id": pa.array(cluster.astype(str)),
+        "pc1": (tempo - tempo.mean()) / tempo.std() + rng.normal(0, 0.3, quantidade),
+        "pc2": rng.normal(0, 1, quantidade),
+    })
+
+
+def parte_gps(rng, linhas, quantidade, dias):
+    datas = _datas(rng, quantidade, dias)
+    segundos = rng.integers(0, 86_400, quantidade).astype("timedelta64[s]")
+    return pa.table({
+        "servico": pa.array(rng.choice(linhas, quantidade)),
+        "data": pa.array(datas.astype("datetime64[D]")),
+        "latitude": rng.uniform(LATITUDE_MIN, LATITUDE_MAX, quantidade),
+        "longitude": rng.uniform(LONGITUDE_MIN, LONGITUDE_MAX, quantidade),
+        "timestamp_gps": pa.array(datas.astype("datetime64[s]") + segundos),
+    })
+
+
+def gerar(diretorio, linhas_resumo, pontos_gps=None, quantidade_linhas=300, dias=365, semente=0):
+    rng = np.random.default_rng(semente)
+    diretorio = Path(diretorio)
+    pontos_gps = linhas_resumo if pontos_gps is None else pontos_gps
+    linhas = nomes_linhas(quantidade_linhas, rng)
+
+    for tabela, total, gerar_parte in (
+        ("resumo", linhas_resumo, parte_resumo),
+        ("gps", pontos_gps, parte_gps),
+    ):
+        pasta = diretorio / tabela
+        pasta.mkdir(parents=True, exist_ok=True)
+        for numero, quantidade in enumerate(_partes(total)):
+            pq.write_table(gerar_parte(rng, linhas, quantidade, dias), pasta / f"parte-{numero}.parquet")
+
+    return {
+        "diretorio": str(diretorio),
+        "linhas_resumo": linhas_resumo,
+        "pontos_gps": pontos_gps,
+        "linhas_onibus": [str(linha) for linha in linhas],
+        "primeiro_dia": DATA_INICIAL,
+        "ultimo_dia": str((pd.Timestamp(DATA_INICIAL) + pd.Timedelta(days=dias - 1)).date()),
+    }
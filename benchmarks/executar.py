@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import plotly.io as pio
+
+from benchmarks.dados_sinteticos import gerar
+from cocada.agregados import MOTORES, CuboAgregados
+from cocada.config import RAIZ_PROJETO
+from cocada.esquema import normalizar_gps, normalizar_resumo, pegada_memoria
+from cocada.fontes import FonteLocal
+from cocada.graficos import figura_box, figura_causa_efeito, figura_mapa, figura_pca
+from cocada.mapa import ZOOM_PADRAO, celulas_para_zoom
+from cocada.versao import marcar_versao
+
+
+# ======================================================================
+# BENCHMARK DAS ETAPAS DO PAINEL
+# ======================================================================
+# Para cada tamanho gera dados sintéticos, lê pela FonteLocal e mede cada
+# etapa separadamente: carga, normalização dos tipos, filtro, agregados,
+# construção das figuras e serialização (o mesmo JSON que o
+# st.plotly_chart envia ao navegador). O resultado vai para um JSON com a
+# versão do código, para comparar execuções entre commits.
+#
+#   python -m benchmarks.executar --tamanhos 1e3 1e4 1e5 1e6 1e7
+
+TAMANHOS_PADRAO = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+DIRETORIO_RESULTADOS = RAIZ_PROJETO / ".cache" / "benchmarks"
+
+
+class Cronometro:
+    def __init__(self, repeticoes):
+        self.repeticoes = repeticoes
+        self.etapas = {}
+
+    def medir(self, nome, funcao):
+        tempos = []
+        for _ in range(self.repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        self.etapas[nome] = {
+            "min_s": round(min(tempos), 6),
+            "mediana_s": round(statistics.median(tempos), 6),
+        }
+        return resultado
+
+
+def serializar(figura):
+    # Mesmo caminho do st.plotly_chart: to_dict + JSON sem validação
+    return pio.to_json(figura.to_dict(), validate=False)
+
+
+def medir_tamanho(linhas_resumo, args, diretorio):
+    info = gerar(
+        diretorio, linhas_resumo,
+        quantidade_linhas=args.linhas_onibus, dias=args.dias, semente=args.semente,
+    )
+    rng = np.random.default_rng(args.semente)
+    cronometro = Cronometro(args.repeticoes)
+    medir = cronometro.medir
+
+    # Carga e normalização
+    fonte = FonteLocal(diretorio)
+    bruto = medir("carga", lambda: fonte.resumo())
+    df = medir("normalizacao", lambda: marcar_versao(normalizar_resumo(bruto)))
+
+    # Filtro: todas as linhas (padrão do painel) e uma seleção parcial
+    linhas = list(df["linha"].cat.categories)
+    todas = medir("filtro_todas", lambda: df[df["linha"].isin(linhas)])
+    quantidade = max(int(len(linhas) * args.fracao_linhas), 1)
+    selecao = [str(linha) for linha in rng.choice(linhas, quantidade, replace=False)]
+    df_selecao = medir("filtro_selecao", lambda: df[df["linha"].isin(selecao)])
+
+    # Agregados: montagem do cubo e as consultas feitas a cada rerun
+    cubo = medir("agregados_cubo", lambda: CuboAgregados(df, args.motor))
+
+    def consultas():
+        cubo.linha_mais_atrasada()
+        cubo.resumo_selecao(selecao)
+        cubo.comparacao(selecao)
+        cubo.ranking(minimo_observacoes=5, quantidade=10)
+        return cubo.ordem_por_mediana(selecao)
+
+    ordem = medir("agregados_consultas", consultas)
+
+    # Mapa: células do período inteiro e a grade do zoom padrão
+    celulas = medir(
+        "carga_gps",
+        lambda: normalizar_gps(fonte.gps(info["primeiro_dia"], info["ultimo_dia"])),
+    )
+    df_mapa = medir("grade_mapa", lambda: celulas_para_zoom(celulas, ZOOM_PADRAO, selecao))
+
+    # Figuras e serialização
+    figuras = {
+        "causa_efeito": lambda: figura_causa_efeito(df_selecao)[0],
+        "pca": lambda: figura_pca(df_selecao)[0],
+        "comparacao": lambda: figura_box(cubo.caixas(selecao), ordem),
+        "mapa": lambda: figura_mapa(df_mapa, ZOOM_PADRAO),
+    }
+    bytes_figuras = {}
+    for nome, construir in figuras.items():
+        figura = medir(f"figura_{nome}", construir)
+        especificacao = medir(f"serializacao_{nome}", lambda: serializar(figura))
+        bytes_figuras[nome] = len(especificacao)
+
+    return {
+        "linhas_resumo": linhas_resumo,
+        "pontos_gps": info["pontos_gps"],
+        "linhas_onibus": len(linhas),
+        "linhas_selecionadas": len(selecao),
+        "registros_selecionados": len(df_selecao),
+        "registros_todas": len(todas),
+        "celulas_mapa": len(df_mapa),
+        "memoria_bytes": {
+            "antes_normalizacao": pegada_memoria(bruto),
+            "depois_normalizacao": pegada_memoria(df),
+        },
+        "bytes_figuras": bytes_figuras,
+        "etapas": cronometro.etapas,
+    }
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ_PROJETO, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ambiente():
+    import duckdb
+    import pandas
+    import plotly
+    import pyarrow
+
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "pyarrow": pyarrow.__version__,
+        "duckdb": duckdb.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do painel com dados sintéticos")
+    parser.add_argument("--tamanhos", nargs="+", type=float, default=TAMANHOS_PADRAO,
+                        help="linhas da tabela resumo (ex.: 1e3 1e5 1e7)")
+    parser.add_argument("--linhas-onibus", type=int, default=300, help="quantidade de linhas de ônibus")
+    parser.add_argument("--dias", type=int, default=365, help="dias cobertos pelos dados")
+    parser.add_argument("--fracao-linhas", type=float, default=0.1,
+                        help="fração das linhas na seleção parcial do filtro")
+    parser.add_argument("--motor", choices=MOTORES, default="pandas",
+                        help="motor dos agregados (rode uma vez com cada para comparar)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--dados", help="pasta onde gravar os dados gerados (padrão: temporária)")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    commit = versao_codigo()
+    resultado = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "ambiente": ambiente(),
+        "parametros": {
+            "linhas_onibus": args.linhas_onibus,
+            "dias": args.dias,
+            "fracao_linhas": args.fracao_linhas,
+            "motor": args.motor,
+            "repeticoes": args.repeticoes,
+            "semente": args.semente,
+        },
+        "tamanhos": [],
+    }
+
+    for tamanho in sorted(int(t) for t in args.tamanhos):
+        print(f"⏱️  {tamanho:,} linhas...", flush=True)
+        if args.dados:
+            medicao = medir_tamanho(tamanho, args, Path(args.dados) / str(tamanho))
+        else:
+            with tempfile.TemporaryDirectory(prefix="cocada-bench-") as temporario:
+                medicao = medir_tamanho(tamanho, args, temporario)
+        resultado["tamanhos"].append(medicao)
+        for etapa, tempos in medicao["etapas"].items():
+            print(f"    {etapa:<28} {tempos['mediana_s'] * 1000:10.1f} ms")
+
+    saida = Path(args.saida) if args.saida else (
+        DIRETORIO_RESULTADOS / f"benchmark-{commit or 'sem-git'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"📄 Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.dados_sinteticos import gerar
+from benchmarks.executar import DIRETORIO_RESULTADOS, ambiente, versao_codigo
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# RELATÓRIO DE PARTIDA A FRIO
+# ======================================================================
+# Cada medição roda num processo Python novo, com -X importtime, o
+# dashboard pelo AppTest do Streamlit: primeiro a tela do questionário
+# (primeira pintura) e depois a página de resultados, com uma fonte local
+# de dados sintéticos. O relatório traz o tempo de cada fase e quanto cada
+# módulo importado pelo app custou nela, para que regressões na partida
+# apareçam entre commits.
+#
+#   python -m benchmarks.partida --repeticoes 5
+
+MARCADOR = "@@cocada-fase"
+
+CODIGO_FILHO = f"""
+import json, sys, time
+
+inicio = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+importacao_streamlit = time.perf_counter() - inicio
+
+def fase(nome):
+    print("{MARCADOR} " + nome, file=sys.stderr, flush=True)
+    return set(sys.modules)
+
+def pacotes(depois, antes):
+    return sorted({{modulo.split(".")[0] for modulo in depois - antes}})
+
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+
+antes = fase("questionario")
+inicio = time.perf_counter()
+app.run()
+questionario = time.perf_counter() - inicio
+modulos_questionario = pacotes(set(sys.modules), antes)
+
+antes = fase("resultados")
+app.text_input(key="q3").input("321")
+app.button[0].click()
+inicio = time.perf_counter()
+app.run()
+resultados = time.perf_counter() - inicio
+modulos_resultados = pacotes(set(sys.modules), antes)
+
+fase("fim")
+print(json.dumps({{
+    "importacao_streamlit_s": importacao_streamlit,
+    "questionario_s": questionario,
+    "resultados_s": resultados,
+    "excecoes": [str(excecao.value) for excecao in app.exception],
+    "pacotes_questionario": modulos_questionario,
+    "pacotes_resultados": modulos_resultados,
+}}))
+"""
+
+
+def importacoes_por_fase(saida_erro):
+    # Linhas do -X importtime: "import time: self [us] | cumulative | nome",
+    # com o nome indentado conforme a profundidade. Só os imports de topo de
+    # cada fase entram, com o tempo acumulado (incluindo os dependentes).
+    fases = {}
+    atual = None
+    for linha in saida_erro.splitlines():
+        if linha.startswith(MARCADOR):
+            atual = linha.split()[-1]
+            fases.setdefault(atual, [])
+            continue
+        if atual is None or not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        fases[atual].append((len(nome) - len(nome.lstrip()), nome.strip(), int(acumulado) / 1e6))
+
+    resultado = {}
+    for fase, entradas in fases.items():
+        if not entradas:
+            continue
+        topo = min(profundidade for profundidade, _, _ in entradas)
+        modulos = [(nome, segundos) for profundidade, nome, segundos in entradas if profundidade == topo]
+        resultado[fase] = {
+            nome: round(segundos, 6)
+            for nome, segundos in sorted(modulos, key=lambda item: item[1], reverse=True)
+        }
+    return resultado
+
+
+def medir_partida(dados, temporario):
+    ambiente_filho = {
+        **os.environ,
+        "COCADA_FONTE": "local",
+        "COCADA_DADOS_LOCAIS": str(dados),
+        "COCADA_ARQUIVO_RESPOSTAS": str(Path(temporario) / "respostas.sqlite"),
+        "COCADA_ARQUIVO_METRICAS": "",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(RAIZ_PROJETO), os.environ.get("PYTHONPATH")])),
+    }
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO_FILHO, str(RAIZ_PROJETO / "dashboard.py")],
+        capture_output=True, text=True, env=ambiente_filho, cwd=temporario, check=True,
+    )
+    medicao = json.loads(processo.stdout.strip().splitlines()[-1])
+    medicao["importacoes_s"] = importacoes_por_fase(processo.stderr)
+    return medicao
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Relatório de partida a frio do painel")
+    parser.add_argument("--repeticoes", type=int, default=3, help="processos novos medidos")
+    parser.add_argument("--linhas-resumo", type=int, default=10_000, help="tamanho dos dados sintéticos")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    commit = versao_codigo()
+
+    with tempfile.TemporaryDirectory(prefix="cocada-partida-") as temporario:
+        dados = Path(temporario) / "dados"
+        gerar(dados, args.linhas_resumo)
+        medicoes = [medir_partida(dados, temporario) for _ in range(args.repeticoes)]
+
+    fases = ["importacao_streamlit_s", "questionario_s", "resultados_s"]
+    resultado = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "ambiente": ambiente(),
+        "parametros": {"repeticoes": args.repeticoes, "linhas_resumo": args.linhas_resumo},
+        "mediana_s": {fase: round(statistics.median(m[fase] for m in medicoes), 6) for fase in fases},
+        "medicoes": medicoes,
+    }
+
+    for fase, segundos in resultado["mediana_s"].items():
+        print(f"    {fase:<28} {segundos * 1000:10.1f} ms")
+    print("    importações mais caras do questionário:")
+    for nome, segundos in list(medicoes[0]["importacoes_s"].get("questionario", {}).items())[:10]:
+        print(f"        {nome:<36} {segundos * 1000:8.1f} ms")
+    if any(m["excecoes"] for m in medicoes):
+        print(f"⚠️ Exceções no app: {medicoes[0]['excecoes']}")
+
+    saida = Path(args.saida) if args.saida else (
+        DIRETORIO_RESULTADOS / f"partida-{commit or 'sem-git'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"📄 Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
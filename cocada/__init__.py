@@ -0,0 +1 @@
+# Camada de dados do Painel de Atrasos do Fundão (sem dependência do Streamlit)
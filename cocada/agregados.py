@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+
+from cocada import config
+
+
+# ======================================================================
+# CUBO DE AGREGADOS POR LINHA
+# ======================================================================
+# Montado uma vez por versão dos dados. Os cards, o chute, o Pódio e a
+# tabela de comparação leem daqui; estatísticas de um subconjunto de linhas
+# são combinadas a partir dos agregados, sem varrer o DataFrame de novo.
+
+METRICAS = ["tempo_total_fundao", "prop_atrasadas", "velocidade_media_fundao"]
+ESTATISTICAS = ["count", "sum", "mean", "std", "min", "max", "median"]
+
+# Quem faz os agrupamentos: "pandas" ou "duckdb" (ver MOTOR DUCKDB abaixo)
+MOTORES = ("pandas", "duckdb")
+MOTOR_PADRAO = config.obter("motor_agregados", "pandas")
+
+
+# ======================================================================
+# RESUMO DE CAIXA (BOX PLOT) POR GRUPO
+# ======================================================================
+# Quartis exatos, cercas e extremos de cada grupo, calculados uma vez. O
+# método de interpolação é o mesmo que o Plotly usa ao montar um box a
+# partir dos pontos (quartilemethod="linear", posição p·n − 0,5, que no
+# NumPy é o método "hazen"), então a caixa desenhada a partir do resumo é
+# igual à que o navegador calcularia recebendo todas as observações.
+
+COLUNAS_CAIXA = ["n", "minimo", "q1", "mediana", "q3", "maximo", "cerca_inferior", "cerca_superior"]
+
+
+def _quantil_ordenado(valores, inicios, tamanhos, p):
+    # Quantil "hazen" de cada grupo de um vetor ordenado por grupo e valor
+    posicao = np.clip(p * tamanhos - 0.5, 0, tamanhos - 1)
+    abaixo = np.floor(posicao).astype(np.int64)
+    acima = np.ceil(posicao).astype(np.int64)
+    fracao = posicao - abaixo
+    return valores[inicios + abaixo] * (1 - fracao) + valores[inicios + acima] * fracao
+
+
+def resumo_caixas(df, chaves, coluna="tempo_total_fundao"):
+    dados = df[chaves + [coluna]].dropna(subset=[coluna]).sort_values(chaves + [coluna])
+    grupos = dados.groupby(chaves, observed=True, sort=False).size()
+    return caixas_ordenadas(dados[coluna].to_numpy(dtype=np.float64), grupos)
+
+
+def caixas_ordenadas(valores, grupos):
+    # valores ordenados por grupo e valor; grupos: tamanho de cada grupo, na
+    # mesma ordem, indexado pelas chaves
+    if grupos.empty:
+        return pd.DataFrame(columns=COLUNAS_CAIXA)
+
+    tamanhos = grupos.to_numpy()
+    inicios = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    q1 = _quantil_ordenado(valores, inicios, tamanhos, 0.25)
+    q3 = _quantil_ordenado(valores, inicios, tamanhos, 0.75)
+
+    # Cercas como no Plotly: o ponto mais extremo ainda dentro de 1,5 × IQR
+    grupo = np.repeat(np.arange(len(tamanhos)), tamanhos)
+    iqr = q3 - q1
+    dentro = (valores >= (q1 - 1.5 * iqr)[grupo]) & (valores <= (q3 + 1.5 * iqr)[grupo])
+    cercas = pd.Series(valores[dentro]).groupby(grupo[dentro]).agg(["min", "max"]).reindex(range(len(tamanhos)))
+
+    return pd.DataFrame({
+        "n": tamanhos,
+        "minimo": valores[inicios],
+        "q1": q1,
+        "mediana": _quantil_ordenado(valores, inicios, tamanhos, 0.5),
+        "q3": q3,
+        "maximo": valores[inicios + tamanhos - 1],
+        "cerca_inferior": np.minimum(cercas["min"].to_numpy(), q1),
+        "cerca_superior": np.maximum(cercas["max"].to_numpy(), q3),
+    }, index=grupos.index)
+
+
+def agregar_pandas(df):
+    # As métricas podem vir em float32; os agregados acumulam em float64
+    df = df.astype({metrica: "float64" for metrica in METRICAS})
+    grupos = df.groupby("linha", observed=True, sort=True)
+
+    return {
+        # Por linha e por linha × cluster: count, sum, mean, std, min, max, median
+        "por_linha": grupos[METRICAS].agg(ESTATISTICAS),
+        "por_linha_cluster": df.groupby(["linha", "cluster_id"], observed=True)[METRICAS].agg(ESTATISTICAS),
+        # Quartis do tempo no Fundão: por linha × cluster (caixas da Comparação
+        # Direta) e por linha (tabela de comparação e ordem das caixas)
+        "caixas_linha_cluster": resumo_caixas(df, ["linha", "cluster_id"]),
+        "caixas_linha": resumo_caixas(df, ["linha"]),
+        # Número de dias (linhas do DataFrame) por linha, para a regra das ≥ 5 observações
+        "observacoes": grupos.size(),
+        # Tempos ordenados por linha: a mediana não é combinável a partir de
+        # medianas, então a de um subconjunto sai da junção destes vetores
+        "tempos": {
+            linha: np.sort(valores.dropna().to_numpy())
+            for linha, valores in grupos["tempo_total_fundao"]
+        },
+    }
+
+
+# ======================================================================
+# MOTOR DUCKDB
+# ======================================================================
+# Os mesmos agregados de agregar_pandas, calculados pelo DuckDB (colunar e
+# com várias threads) direto sobre os arrays do DataFrame, sem cópias
+# intermediárias. A linha entra pelo código da categoria, então os índices
+# devolvidos são os mesmos do pandas (mesmas categorias, mesma ordem).
+# Contagens, mínimos, máximos, medianas, quartis e a ordem dos grupos saem
+# idênticos; soma (Kahan, como no pandas), média e desvio padrão podem
+# diferir só no último dígito do float64, pela ordem de acumulação entre
+# threads. Os quartis são interpolados pelo mesmo código NumPy: o DuckDB só
+# ordena.
+
+
+def _estatisticas_sql(metrica):
+    valor = f"CAST({metrica} AS DOUBLE)"
+    return [
+        f"COUNT({valor})",
+        f"COALESCE(FSUM({valor}), 0)",
+        f"FSUM({valor}) / COUNT({valor})",
+        f"STDDEV_SAMP({valor})",
+        f"MIN({valor})",
+        f"MAX({valor})",
+        f"MEDIAN({valor})",
+    ]
+
+
+def _coluna_float(valores):
+    # NULL do DuckDB (grupo sem valores, desvio com n = 1) vira NaN, como no pandas
+    return np.ma.filled(np.ma.asarray(valores).astype(np.float64), np.nan)
+
+
+def _agrupar_sql(con, chaves, indice):
+    colunas = [expressao for metrica in METRICAS for expressao in _estatisticas_sql(metrica)]
+    resultado = con.execute(f"""
+        SELECT {", ".join(chaves + colunas)}
+        FROM dados
+        GROUP BY {", ".join(chaves)}
+        ORDER BY {", ".join(chaves)}
+    """).fetchnumpy()
+    valores = np.column_stack([_coluna_float(resultado[coluna]) for coluna in list(resultado)[len(chaves):]])
+    tabela = pd.DataFrame(valores, index=indice(resultado), columns=pd.MultiIndex.from_product([METRICAS, ESTATISTICAS]))
+    # count volta como inteiro, como no groupby().agg()
+    return tabela.astype({(metrica, "count"): "int64" for metrica in METRICAS})
+
+
+def _tempos_ordenados_sql(con, chaves, indice):
+    # Tempos ordenados por grupo e valor, e o tamanho de cada grupo
+    tempos = con.execute(f"""
+        SELECT CAST(tempo_total_fundao AS DOUBLE) AS tempo
+        FROM dados
+        WHERE tempo_total_fundao IS NOT NULL AND NOT isnan(tempo_total_fundao)
+        ORDER BY {", ".join(chaves)}, tempo
+    """).fetchnumpy()["tempo"]
+    grupos = con.execute(f"""
+        SELECT {", ".join(chaves)}, COUNT(*) AS n
+        FROM dados
+        WHERE tempo_total_fundao IS NOT NULL AND NOT isnan(tempo_total_fundao)
+        GROUP BY {", ".join(chaves)}
+        ORDER BY {", ".join(chaves)}
+    """).fetchnumpy()
+    return np.asarray(tempos, dtype=np.float64), pd.Series(np.asarray(grupos["n"]), index=indice(grupos))
+
+
+def agregar_duckdb(df):
+    import duckdb
+
+    tipo_linha = df["linha"].dtype
+
+    def indice_linha(resultado):
+        codigos = np.asarray(resultado["linha"])
+        return pd.CategoricalIndex(pd.Categorical.from_codes(codigos, dtype=tipo_linha), name="linha")
+
+    def indice_linha_cluster(resultado):
+        return pd.MultiIndex.from_arrays([
+            pd.Categorical.from_codes(np.asarray(resultado["linha"]), dtype=tipo_linha),
+            np.asarray(resultado["cluster_id"]).astype(df["cluster_id"].dtype),
+        ], names=["linha", "cluster_id"])
+
+    dados = pd.DataFrame({
+        "linha": df["linha"].cat.codes.to_numpy(),
+        "cluster_id": df["cluster_id"].to_numpy(),
+        **{metrica: df[metrica].to_numpy() for metrica in METRICAS},
+    })
+
+    with duckdb.connect() as con:
+        con.register("dados", dados)
+        por_linha = _agrupar_sql(con, ["linha"], indice_linha)
+        por_linha_cluster = _agrupar_sql(con, ["linha", "cluster_id"], indice_linha_cluster)
+        tempos_linha, grupos_linha = _tempos_ordenados_sql(con, ["linha"], indice_linha)
+        tempos_cluster, grupos_cluster = _tempos_ordenados_sql(con, ["linha", "cluster_id"], indice_linha_cluster)
+        observacoes = con.execute(
+            "SELECT linha, COUNT(*) AS n FROM dados GROUP BY linha ORDER BY linha"
+        ).fetchnumpy()
+
+    fins = np.cumsum(grupos_linha.to_numpy())
+    tempos = dict(zip(grupos_linha.index, np.split(tempos_linha, fins[:-1])))
+    return {
+        "por_linha": por_linha,
+        "por_linha_cluster": por_linha_cluster,
+        "caixas_linha_cluster": caixas_ordenadas(tempos_cluster, grupos_cluster),
+        "caixas_linha": caixas_ordenadas(tempos_linha, grupos_linha),
+        "observacoes": pd.Series(np.asarray(observacoes["n"]), index=indice_linha(observacoes)),
+        # Linhas só com tempos nulos também têm entrada, como no pandas
+        "tempos": {linha: tempos.get(linha, np.array([])) for linha in por_linha.index},
+    }
+
+
+class CuboAgregados:
+    def __init__(self, df, motor=None):
+        self.motor = motor or MOTOR_PADRAO
+        if self.motor not in MOTORES:
+            raise ValueError(f"Motor de agregados desconhecido: {self.motor}")
+
+        agregar = agregar_duckdb if self.motor == "duckdb" else agregar_pandas
+        agregados = agregar(df)
+        self.por_linha = agregados["por_linha"]
+        self.por_linha_cluster = agregados["por_linha_cluster"]
+        self.caixas_linha_cluster = agregados["caixas_linha_cluster"]
+        self.caixas_linha = agregados["caixas_linha"]
+        self.observacoes = agregados["observacoes"]
+        self.tempos = agregados["tempos"]
+
+    def _linhas(self, linhas):
+        indice = self.por_linha.index
+        return indice[indice.isin(linhas)]
+
+    # ------------------------------------------------------------------
+    # Chute e cards
+    # ------------------------------------------------------------------
+
+    def linha_mais_atrasada(self):
+        media = self.por_linha[("prop_atrasadas", "mean")]
+        return media.idxmax(), media.max() * 100
+
+    def resumo_selecao(self, linhas):
+        linhas = self._linhas(linhas)
+        atrasos = self.por_linha.loc[linhas, "prop_atrasadas"]
+        tempos = [self.tempos[linha] for linha in linhas]
+        tempos = np.concatenate(tempos) if tempos else np.array([])
+
+        return {
+            "mediana_tempo": float(np.median(tempos)) if len(tempos) else np.nan,
+            "media_atraso": atrasos["sum"].sum() / atrasos["count"].sum() if atrasos["count"].sum() else np.nan,
+            "clusters": self.por_linha_cluster.loc[linhas].index.get_level_values("cluster_id").nunique(),
+        }
+
+    # ------------------------------------------------------------------
+    # Comparação Direta e Pódio
+    # ------------------------------------------------------------------
+
+    def ordem_por_mediana(self, linhas):
+        medianas = self.caixas_linha.loc[self.caixas_linha.index.isin(linhas), "mediana"]
+        return medianas.sort_values(ascending=False).index
+
+    def caixas(self, linhas):
+        # Uma linha por linha × cluster: o que o box plot precisa, sem as observações
+        caixas = self.caixas_linha_cluster
+        return caixas[caixas.index.get_level_values("linha").isin(linhas)]
+
+    def comparacao(self, linhas):
+        linhas = self._linhas(linhas)
+        caixas = self.caixas_linha.reindex(linhas)
+        return pd.DataFrame({
+            "minimo": caixas["minimo"],
+            "mediana": caixas["mediana"],
+            "maximo": caixas["maximo"],
+            "total": self.por_linha.loc[linhas, ("tempo_total_fundao", "sum")],
+            "media_atraso": self.por_linha.loc[linhas, ("prop_atrasadas", "mean")],
+        }, index=linhas)
+
+    def ranking(self, minimo_observacoes=5, quantidade=10):
+        validas = self.observacoes[self.observacoes >= minimo_observacoes].index
+        ranking = self.por_linha.loc[validas, [
+            ("prop_atrasadas", "mean"),
+            ("prop_atrasadas", "std"),
+            ("prop_atrasadas", "count"),
+            ("tempo_total_fundao", "mean"),
+            ("tempo_total_fundao", "sum"),
+            ("velocidade_media_fundao", "mean"),
+        ]]
+        ranking.columns = ['_'.join(col).strip() for col in ranking.columns.values]
+        return ranking.sort_values("prop_atrasadas_mean", ascending=False).head(quantidade)
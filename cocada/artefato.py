@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# ARTEFATO PRÉ-CALCULADO (PARQUET VERSIONADO + MANIFESTO)
+# ======================================================================
+# Cada execução do pré-cálculo grava uma pasta nova:
+#
+#   <artefatos>/<versao>/resumo/parte-0.parquet        -> COLUNAS_RESUMO
+#   <artefatos>/<versao>/celulas_gps/parte-0.parquet   -> linha, data, cluster_id,
+#                                                         celula_lat, celula_lon, pontos
+#   <artefatos>/<versao>/manifesto.json                -> linhas, período e sha256
+#                                                         de cada arquivo
+#   <artefatos>/ATUAL                                  -> nome da versão mais recente
+#
+# A pasta só aparece depois de completa (gravação numa pasta temporária e
+# rename) e o ponteiro ATUAL é trocado por último, então o painel nunca
+# abre um artefato pela metade.
+
+DIRETORIO_PADRAO = config.obter("artefatos_dir", str(RAIZ_PROJETO / ".cache" / "artefatos"))
+PONTEIRO = "ATUAL"
+MANIFESTO = "manifesto.json"
+
+TABELA_RESUMO = "resumo"
+TABELA_GPS = "celulas_gps"
+
+COMPRESSAO = "zstd"
+# Grupos de linhas pequenos o bastante para as estatísticas de `data`
+# (arquivo ordenado por dia) descartarem o que está fora do período pedido
+LINHAS_POR_GRUPO = 64 * 1024
+
+
+def soma_verificacao(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _gravar_tabela(tabela, pasta):
+    tabela = tabela.sort_by([("data", "ascending"), ("linha", "ascending")])
+    caminho = pasta / "parte-0.parquet"
+    caminho.parent.mkdir(parents=True)
+    pq.write_table(tabela, caminho, compression=COMPRESSAO, row_group_size=LINHAS_POR_GRUPO)
+
+    datas = pc.min_max(tabela["data"])
+    return {
+        "arquivo": caminho.relative_to(pasta.parent).as_posix(),
+        "linhas": tabela.num_rows,
+        "primeiro_dia": str(datas["min"].as_py()) if tabela.num_rows else None,
+        "ultimo_dia": str(datas["max"].as_py()) if tabela.num_rows else None,
+        "bytes": caminho.stat().st_size,
+        "sha256": soma_verificacao(caminho),
+    }
+
+
+def gravar(resumo, celulas_gps, diretorio=DIRETORIO_PADRAO, origem=None):
+    # resumo e celulas_gps: tabelas Arrow com a coluna `data` (date32)
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    preparacao = diretorio / f".tmp-{uuid.uuid4().hex}"
+
+    try:
+        tabelas = {
+            TABELA_RESUMO: _gravar_tabela(resumo, preparacao / TABELA_RESUMO),
+            TABELA_GPS: _gravar_tabela(celulas_gps, preparacao / TABELA_GPS),
+        }
+        criado_em = datetime.now()
+        versao = f"{criado_em:%Y%m%d-%H%M%S}-{tabelas[TABELA_RESUMO]['sha256'][:8]}"
+        manifesto = {
+            "versao": versao,
+            "criado_em": criado_em.isoformat(timespec="seconds"),
+            "origem": origem or {},
+            "tabelas": tabelas,
+        }
+        with open(preparacao / MANIFESTO, "w") as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        os.replace(preparacao, diretorio / versao)
+    finally:
+        shutil.rmtree(preparacao, ignore_errors=True)
+
+    _apontar(diretorio, versao)
+    return manifesto
+
+
+def _apontar(diretorio, versao):
+    temporario = diretorio / f".{PONTEIRO}.{uuid.uuid4().hex}"
+    temporario.write_text(versao + "\n")
+    os.replace(temporario, diretorio / PONTEIRO)
+
+
+def versao_atual(diretorio=DIRETORIO_PADRAO):
+    ponteiro = Path(diretorio) / PONTEIRO
+    if not ponteiro.exists():
+        return None
+    return ponteiro.read_text().strip() or None
+
+
+def abrir(diretorio=DIRETORIO_PADRAO, versao=None, verificar=True):
+    # Manifesto da versão pedida (ou da atual), com os arquivos conferidos
+    versao = versao or versao_atual(diretorio)
+    if versao is None:
+        raise FileNotFoundError(f"nenhum artefato em {diretorio} (rode python -m cocada.precalcular)")
+
+    caminho = Path(diretorio) / versao
+    with open(caminho / MANIFESTO) as f:
+        manifesto = json.load(f)
+
+    if verificar:
+        for nome, tabela in manifesto["tabelas"].items():
+            if soma_verificacao(caminho / tabela["arquivo"]) != tabela["sha256"]:
+                raise ValueError(f"soma de verificação não confere em {versao}/{tabela['arquivo']}")
+
+    return {**manifesto, "caminho": str(caminho)}
+
+
+def limpar_antigos(diretorio=DIRETORIO_PADRAO, manter=3):
+    # Mantém as `manter` versões mais recentes (e sempre a atual)
+    atual = versao_atual(diretorio)
+    versoes = sorted(
+        (pasta for pasta in Path(diretorio).iterdir() if (pasta / MANIFESTO).exists()),
+        key=lambda pasta: pasta.name, reverse=True,
+    )
+    removidas = []
+    for pasta in versoes[manter:]:
+        if pasta.name != atual:
+            shutil.rmtree(pasta, ignore_errors=True)
+            removidas.append(pasta.name)
+    return removidas
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from cocada import metricas
+
+
+# ======================================================================
+# ATUALIZAÇÃO EM SEGUNDO PLANO (STALE-WHILE-REVALIDATE)
+# ======================================================================
+# Os loaders do painel recebem a versão dos dados como primeiro argumento,
+# então cada versão ocupa entradas próprias nos caches. De tempos em tempos
+# uma thread cria uma versão nova, busca os dados na fonte e carrega nos
+# caches o que as sessões vêm pedindo (aquecer). Só depois disso a versão
+# atual é trocada, numa atribuição única: até a troca as sessões continuam
+# recebendo a versão anterior, e depois dela encontram os caches prontos.
+# Nenhuma execução do painel espera pela atualização; se ela falhar, a
+# versão anterior continua valendo e uma nova tentativa é feita em até
+# ESPERA_APOS_FALHA_S.
+
+# Pedidos recentes (loader + argumentos) recarregados a cada atualização
+MAXIMO_PEDIDOS = 8
+# Depois de uma falha a próxima tentativa vem antes do intervalo normal
+ESPERA_APOS_FALHA_S = 60
+
+log = logging.getLogger("cocada.atualizacao")
+
+
+def nova_versao():
+    # Data legível para o painel de depuração e um sufixo aleatório: duas
+    # versões criadas no mesmo segundo (a inicial e uma atualização
+    # imediata) nunca colidem nas chaves dos caches
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+class Atualizador:
+    def __init__(self, aquecer, intervalo_s, imediata=False):
+        # aquecer(versao, pedidos): busca a versão nova e carrega os caches;
+        # intervalo_s <= 0 desliga a thread (a versão fica fixa)
+        # imediata: primeira atualização logo ao iniciar, em vez de esperar
+        # um intervalo (ex.: processo novo servindo um snapshot de disco)
+        self.aquecer = aquecer
+        self.intervalo_s = intervalo_s
+        self.imediata = imediata
+
+        self.versao = nova_versao()
+        self.atualizada_em = datetime.now()
+        self.ultimo_erro = None
+        self.pedidos = OrderedDict()
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def ativa(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        if self.intervalo_s > 0 and not self.ativa:
+            self._thread = threading.Thread(target=self._atualizar_continuamente, name="atualizacao", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def registrar(self, *pedido):
+        # Chamado pelos loaders: o que foi pedido na versão atual é
+        # recarregado na próxima, antes da troca
+        with self._trava:
+            self.pedidos[pedido] = None
+            self.pedidos.move_to_end(pedido)
+            while len(self.pedidos) > MAXIMO_PEDIDOS:
+                self.pedidos.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Thread de atualização
+    # ------------------------------------------------------------------
+
+    def atualizar(self):
+        nova = nova_versao()
+        with self._trava:
+            pedidos = list(self.pedidos)
+
+        with metricas.etapa("atualizacao"):
+            self.aquecer(nova, pedidos)
+
+        # Troca atômica: as execuções seguintes passam a pedir a versão nova
+        with self._trava:
+            self.versao = nova
+            self.atualizada_em = datetime.now()
+            self.ultimo_erro = None
+        metricas.definir("dados_atualizados_em_segundos", time.time())
+        return nova
+
+    def _atualizar_continuamente(self):
+        espera = 0 if self.imediata else self.intervalo_s
+        while not self._parar.wait(espera):
+            espera = self.intervalo_s
+            try:
+                versao = self.atualizar()
+            except Exception as e:
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
+                metricas.contar("atualizacao_total", resultado="falhou")
+                log.warning("Atualização dos dados falhou; a versão %s continua valendo", self.versao, exc_info=True)
+                espera = min(self.intervalo_s, ESPERA_APOS_FALHA_S)
+            else:
+                metricas.contar("atualizacao_total", resultado="ok")
+                log.info("Dados atualizados: versão %s", versao)
+
+    def estado(self):
+        # Para o painel de depuração
+        return {
+            "versao": self.versao,
+            "atualizada_em": self.atualizada_em.isoformat(timespec="seconds"),
+            "intervalo_s": self.intervalo_s,
+            "ativa": self.ativa,
+            "ultimo_erro": self.ultimo_erro,
+        }
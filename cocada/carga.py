@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+
+from cocada import metricas
+from cocada.esquema import normalizar_gps, normalizar_resumo
+from cocada.fontes import DATA_MAPA
+from cocada.snapshot import SnapshotResumo
+from cocada.versao import marcar_versao
+
+
+# ======================================================================
+# CARGA DOS DADOS
+# ======================================================================
+# Leitura do resumo, do período disponível e das células do mapa, sem
+# nenhuma chamada ao Streamlit: os loaders em cache do painel usam estas
+# funções tanto na execução do script quanto na pré-carga, que roda numa
+# thread do pool enquanto o questionário está aberto. fonte=None quando a
+# fonte configurada não está disponível (ex.: sem credenciais): nesse caso
+# vale o último snapshot salvo em disco.
+
+
+def sincronizar_snapshot(fonte, snapshot, inicio, progresso=None, novos_dias=True):
+    # Busca incremental: só os trechos do período que ainda não estão no
+    # snapshot local (dias novos e, se o período começa antes, os dias
+    # anteriores), lidos em lotes Arrow que vão direto para o disco. Uma
+    # sincronização por vez: quem chega depois espera e só busca o que a
+    # anterior não gravou
+    with snapshot.sincronizacao():
+        for desde, ate in snapshot.intervalos_faltantes(inicio, recentes=novos_dias):
+            with metricas.etapa("snapshot_anexar"):
+                snapshot.anexar_lotes(fonte.resumo_lotes(desde=desde, ate=ate, progresso=progresso), desde)
+
+
+def atualizar_snapshot(fonte, progresso=None):
+    # Dias novos no snapshot que já existe (chamado pela atualização em
+    # segundo plano, ver cocada.atualizacao)
+    snapshot = SnapshotResumo()
+    if fonte is not None and fonte.remota and snapshot.existe():
+        sincronizar_snapshot(fonte, snapshot, snapshot.primeira_data(), progresso)
+
+
+def ler_resumo(fonte, selecao, progresso=None, novos_dias=True):
+    # O período e as linhas da seleção vão para o WHERE da consulta (ou para
+    # os filtros de partição do Parquet): só o que foi pedido é lido.
+    # novos_dias=False: os dias novos ficam para atualizar_snapshot e o
+    # snapshot só é completado se não cobrir o período pedido
+    snapshot = SnapshotResumo()
+    filtros = {"desde": selecao.inicio, "ate": selecao.fim, "linhas": selecao.linhas}
+
+    if fonte is None:
+        with metricas.etapa("snapshot_ler"):
+            df = snapshot.ler(**filtros)
+    elif fonte.remota:
+        # Dias que faltam baixados para o snapshot, que passa a ser a fonte do DataFrame
+        sincronizar_snapshot(fonte, snapshot, selecao.inicio, progresso, novos_dias)
+        with metricas.etapa("snapshot_ler"):
+            df = snapshot.ler(**filtros)
+    else:
+        # Fontes locais já estão em disco, não precisam do snapshot
+        with metricas.etapa("fonte_resumo"):
+            df = fonte.resumo(**filtros)
+
+    # Tipos compactos (categoria/int8/float32/date32) e versão dos dados
+    with metricas.etapa("normalizacao"):
+        return marcar_versao(normalizar_resumo(df))
+
+
+def ler_reserva(selecao):
+    # Última cópia boa do resumo, salva em disco, para quando a fonte não
+    # responde. Vem marcada em attrs["desatualizado"] com o último dia que
+    # ela tem; None se ainda não há snapshot
+    snapshot = SnapshotResumo()
+    if not snapshot.existe():
+        return None
+    with metricas.etapa("snapshot_ler"):
+        df = snapshot.ler(desde=selecao.inicio, ate=selecao.fim, linhas=selecao.linhas)
+    with metricas.etapa("normalizacao"):
+        df = marcar_versao(normalizar_resumo(df))
+    df.attrs["desatualizado"] = snapshot.ultima_data()
+    return df
+
+
+def periodo_disponivel(fonte):
+    # Primeiro e último dia com dados
+    if fonte is None:
+        return SnapshotResumo().periodo()
+    with metricas.etapa("periodo_disponivel"):
+        return fonte.periodo()
+
+
+def periodo_padrao(primeiro, ultimo, dias=None):
+    # Histórico inteiro, ou só os últimos `dias` dias
+    if not dias:
+        return primeiro, ultimo
+    return max(primeiro, ultimo - timedelta(days=int(dias) - 1)), ultimo
+
+
+def dia_mapa_padrao(primeiro, ultimo):
+    # DATA_MAPA, trazido para dentro do período carregado
+    return min(max(date.fromisoformat(DATA_MAPA), primeiro), ultimo)
+
+
+def ler_mapa(fonte, inicio, fim):
+    # Contagens por linha × cluster × célula da grade fina para o período,
+    # com a versão do conteúdo (chave da figura do mapa)
+    return marcar_versao(normalizar_gps(fonte.gps(inicio, fim)))
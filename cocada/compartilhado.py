@@ -0,0 +1,75 @@
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# DATASET COMPARTILHADO (ARQUIVO ARROW MAPEADO EM MEMÓRIA)
+# ======================================================================
+# Os dados carregados são gravados uma vez num arquivo Arrow IPC sem
+# compressão e abertos com memory map somente leitura. As colunas numéricas
+# viram visões sobre as páginas do arquivo: todas as sessões do processo
+# (e todos os processos/réplicas da máquina) compartilham as mesmas páginas
+# em vez de cada um guardar a sua cópia desserializada.
+
+DIRETORIO_PADRAO = config.obter("compartilhado_dir", str(RAIZ_PROJETO / ".cache" / "compartilhado"))
+# Arquivos que ninguém publicou nem reaproveitou há mais que isso são
+# apagados (config "compartilhado_horas")
+IDADE_MAXIMA_S = float(config.obter("compartilhado_horas", 6)) * 3600
+
+
+def caminho_versao(versao, diretorio=DIRETORIO_PADRAO):
+    return Path(diretorio) / f"resumo-{versao}.arrow"
+
+
+def publicar(df, versao, diretorio=DIRETORIO_PADRAO):
+    # Outro processo pode já ter publicado esta versão: nesse caso só reaproveita
+    caminho = caminho_versao(versao, diretorio)
+    try:
+        # Reaproveitado conta como uso recente (ver limpar_versoes_antigas)
+        os.utime(caminho)
+        return caminho
+    except FileNotFoundError:
+        pass
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+
+    # Um único bloco por coluna: com vários blocos o to_pandas teria de
+    # concatená-los, o que copiaria os dados para fora do memory map
+    tabela = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    temporario = caminho.with_name(f".{caminho.name}.{uuid.uuid4().hex}")
+    with pa.OSFile(str(temporario), "wb") as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela, max_chunksize=max(len(df), 1))
+    os.replace(temporario, caminho)
+
+    return caminho
+
+
+def abrir(caminho):
+    mapa = pa.memory_map(str(caminho), "r")
+    tabela = pa.ipc.open_file(mapa).read_all()
+    # split_blocks evita juntar colunas num bloco 2D novo; colunas numéricas
+    # sem nulos saem como visões somente leitura do arquivo (zero cópia)
+    return tabela.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def limpar_versoes_antigas(diretorio=DIRETORIO_PADRAO, idade_maxima_s=IDADE_MAXIMA_S):
+    # Cada período escolhido tem o seu arquivo, usado por várias sessões e
+    # processos ao mesmo tempo: só sai o que não é publicado nem reaproveitado
+    # há mais de idade_maxima_s. Quem já mapeou um arquivo apagado continua
+    # lendo (o Linux só libera as páginas depois que o último mapeamento é
+    # fechado); quem precisar dele de novo o grava outra vez
+    limite = time.time() - idade_maxima_s
+    for arquivo in Path(diretorio).glob("resumo-*.arrow"):
+        try:
+            if arquivo.stat().st_mtime < limite:
+                arquivo.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,42 @@
+import os
+import sys
+from pathlib import Path
+
+
+# ======================================================================
+# CONFIGURAÇÃO
+# ======================================================================
+# Cada chave é lida primeiro da variável de ambiente COCADA_<CHAVE> e,
+# se o app estiver rodando no Streamlit, da seção [cocada] do secrets.toml:
+#
+#   [cocada]
+#   fonte = "local"
+#   dados_locais = "/caminho/para/parquets"
+
+# Raiz do repositório: os caminhos padrão (.cache/, dados_locais/) partem daqui
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+
+
+def obter(chave, padrao=None):
+    valor = os.environ.get(f"COCADA_{chave.upper()}")
+    if valor is not None:
+        return valor
+
+    # Só consulta o secrets.toml se o Streamlit já estiver carregado
+    if "streamlit" in sys.modules:
+        try:
+            import streamlit as st
+
+            if st.secrets.load_if_toml_exists() and "cocada" in st.secrets:
+                return st.secrets["cocada"].get(chave, padrao)
+        except Exception:
+            pass
+
+    return padrao
+
+
+def obter_bool(chave, padrao=False):
+    valor = obter(chave, padrao)
+    if isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
+    return bool(valor)
@@ -0,0 +1,87 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# ======================================================================
+# TIPOS COMPACTOS DOS DATAFRAMES
+# ======================================================================
+# linha como categoria, cluster_id como int8, métricas em float32 e data
+# como date32. O DataFrame fica bem menor (cada sessão recebe uma cópia do
+# st.cache_data) e isin/groupby ficam mais rápidos.
+
+METRICAS_FLOAT = ["tempo_total_fundao", "prop_atrasadas", "velocidade_media_fundao", "pc1", "pc2"]
+CELULAS = ["celula_lat", "celula_lon"]
+TIPO_DATA = pd.ArrowDtype(pa.date32())
+
+
+def pegada_memoria(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _cluster_para_inteiro(serie):
+    return pd.to_numeric(serie).astype("int8")
+
+
+def rotulos_cluster(serie):
+    # Para os gráficos: int8 -> categoria com rótulo de texto ("1", "2", ...),
+    # para o Plotly usar cores discretas e não uma escala contínua
+    return serie.astype("category").cat.rename_categories(str).rename("cluster_id")
+
+
+def normalizar_resumo(df):
+    antes = pegada_memoria(df)
+
+    df = df.assign(
+        linha=df["linha"].astype(str).astype("category"),
+        data=pd.to_datetime(df["data"]).astype(TIPO_DATA),
+        cluster_id=_cluster_para_inteiro(df["cluster_id"]),
+        **{coluna: df[coluna].astype("float32") for coluna in METRICAS_FLOAT if coluna in df},
+    )
+
+    df.attrs["memoria_antes"] = antes
+    df.attrs["memoria_depois"] = pegada_memoria(df)
+    return df
+
+
+def normalizar_gps(df):
+    if df.empty:
+        return df
+    return df.assign(
+        linha=df["linha"].astype(str).astype("category"),
+        cluster_id=_cluster_para_inteiro(df["cluster_id"]),
+        pontos=df["pontos"].astype("int32"),
+        **{coluna: df[coluna].astype("int16") for coluna in CELULAS},
+    )
+
+
+# ======================================================================
+# LOTES ARROW (INGESTÃO EM STREAMING)
+# ======================================================================
+# Cada lote que chega do BigQuery já é projetado nas colunas usadas e tem
+# os tipos estreitados antes de ir para o disco, então nunca existe uma
+# versão "larga" do resultado inteiro em memória.
+
+TIPOS_LOTE = {
+    "linha": pa.string(),
+    "data": pa.date32(),
+    "cluster_id": pa.int8(),
+    **{coluna: pa.float32() for coluna in METRICAS_FLOAT},
+}
+
+
+def estreitar_lote(lote, colunas):
+    colunas = [coluna for coluna in colunas if coluna in lote.schema.names]
+    arrays = [
+        pc.cast(lote.column(coluna), TIPOS_LOTE[coluna]) if coluna in TIPOS_LOTE else lote.column(coluna)
+        for coluna in colunas
+    ]
+    return pa.RecordBatch.from_arrays(arrays, names=colunas)
+
+
+def lotes_para_dataframe(lotes, colunas):
+    lotes = list(lotes)
+    if not lotes:
+        return pd.DataFrame(columns=colunas)
+    # self_destruct libera cada coluna Arrow assim que ela vira pandas
+    return pa.Table.from_batches(lotes).to_pandas(split_blocks=True, self_destruct=True)
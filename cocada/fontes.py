@@ -0,0 +1,577 @@
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+import pyarrow as pa
+
+from cocada import artefato, config, metricas
+from cocada.config import RAIZ_PROJETO
+from cocada.esquema import estreitar_lote, lotes_para_dataframe
+from cocada.modelo import ModelosExportados
+from cocada.resiliencia import CircuitoAberto, Disjuntor, com_tentativas
+
+
+# Configurações do BigQuery
+BILLING_PROJECT_ID = "profound-portal-480504-a2"
+DATASET_ID = "analise_cocada"
+
+# Dia padrão e caixa (bounding box) do Fundão usados no mapa de GPS
+DATA_MAPA = "2025-10-15"
+LATITUDE_MIN, LATITUDE_MAX = -22.870, -22.838
+LONGITUDE_MIN, LONGITUDE_MAX = -43.250, -43.198
+
+# Lado (em graus) da célula mais fina da grade do mapa; as resoluções mais
+# grossas são obtidas juntando células (ver cocada.mapa)
+PASSO_GRADE = 0.0005
+
+COLUNAS_RESUMO = [
+    "linha", "data", "tempo_total_fundao", "prop_atrasadas",
+    "velocidade_media_fundao", "cluster_id", "pc1", "pc2",
+]
+# Pontos de GPS já agregados: contagem por linha × cluster × célula da grade
+COLUNAS_GPS = ["linha", "cluster_id", "celula_lat", "celula_lon", "pontos"]
+# Mesma contagem por linha × dia × célula, ainda sem a classificação
+COLUNAS_CELULAS_DIA = ["linha", "data", "celula_lat", "celula_lon", "pontos"]
+
+DIRETORIO_LOCAL_PADRAO = str(RAIZ_PROJETO / "dados_locais")
+
+# Conexões HTTP mantidas abertas pelo cliente compartilhado do BigQuery
+TAMANHO_POOL_HTTP = int(config.obter("pool_http", 32))
+
+# Linhas por página quando os resultados vêm da API REST (sem Storage Read API)
+TAMANHO_PAGINA = int(config.obter("tamanho_pagina", 100_000))
+
+# Prazo total de cada consulta (todas as tentativas), tentativas e disjuntor
+# (ver cocada.resiliencia)
+PRAZO_CONSULTA_S = float(config.obter("prazo_consulta_s", 60))
+TENTATIVAS_CONSULTA = int(config.obter("tentativas_consulta", 3))
+FALHAS_DISJUNTOR = int(config.obter("falhas_disjuntor", 3))
+ESPERA_DISJUNTOR_S = float(config.obter("espera_disjuntor_s", 60))
+
+# De quanto em quanto tempo a inferência local confere se os modelos do
+# BigQuery foram treinados de novo (ver cocada.modelo)
+CONFERIR_MODELOS_S = float(config.obter("conferir_modelos_s", 600))
+
+
+class FonteIndisponivel(Exception):
+    pass
+
+
+class ConsultaFalhou(FonteIndisponivel):
+    # A fonte não respondeu: prazo esgotado, erro mesmo depois das novas
+    # tentativas ou circuito aberto. O painel serve a última cópia boa
+    pass
+
+
+# ======================================================================
+# INTERFACE DAS FONTES DE DADOS
+# ======================================================================
+# Toda fonte devolve DataFrames com as mesmas colunas (COLUNAS_RESUMO e
+# COLUNAS_GPS), então o dashboard não precisa saber de onde vêm os dados.
+# O resumo aceita uma seleção (desde/ate = período, inclusive; linhas) que
+# vai para o WHERE da consulta: só os dias e linhas pedidos são lidos.
+
+
+class FonteDados:
+    # Fontes remotas passam pelo snapshot local; fontes locais são lidas direto
+    remota = False
+
+    def resumo(self, desde=None, ate=None, linhas=None):
+        raise NotImplementedError
+
+    def resumo_lotes(self, desde=None, progresso=None, ate=None, linhas=None):
+        # Versão em lotes Arrow do resumo; por padrão é um lote só
+        df = self.resumo(desde, ate, linhas)
+        if progresso is not None:
+            progresso(len(df), len(df))
+        yield estreitar_lote(pa.RecordBatch.from_pandas(df, preserve_index=False), COLUNAS_RESUMO)
+
+    def gps(self, inicio=DATA_MAPA, fim=DATA_MAPA):
+        raise NotImplementedError
+
+    def celulas_gps(self, inicio, fim):
+        # Pontos por linha, dia e célula (COLUNAS_CELULAS_DIA), para o pré-cálculo
+        raise NotImplementedError
+
+    def periodo(self):
+        # (primeiro, último) dia disponível no resumo
+        raise NotImplementedError
+
+    def atualizada(self):
+        # Fonte a usar numa versão nova dos dados (ver cocada.atualizacao);
+        # só muda para fontes presas a uma versão, como o artefato
+        return self
+
+
+# ======================================================================
+# BIGQUERY
+# ======================================================================
+
+
+MODELO_KMEANS = f"`{BILLING_PROJECT_ID}.{DATASET_ID}.modelo_kmeans`"
+MODELO_PCA = f"`{BILLING_PROJECT_ID}.{DATASET_ID}.modelo_pca`"
+TABELA_RESUMO = f"`{BILLING_PROJECT_ID}.{DATASET_ID}.tabela_resumo`"
+
+# Contagem de pontos de GPS por linha, dia e célula da grade do Fundão
+SQL_CELULAS_GPS = f"""
+        celulas_gps AS (
+            SELECT
+                servico as linha,
+                data,
+                CAST(FLOOR((latitude - ({LATITUDE_MIN})) / {PASSO_GRADE}) AS INT64) as celula_lat,
+                CAST(FLOOR((longitude - ({LONGITUDE_MIN})) / {PASSO_GRADE}) AS INT64) as celula_lon,
+                COUNT(*) as pontos
+            FROM `datario.transporte_rodoviario_municipal.gps_onibus`
+            WHERE data BETWEEN @inicio AND @fim
+              AND latitude BETWEEN {LATITUDE_MIN} AND {LATITUDE_MAX}
+              AND longitude BETWEEN {LONGITUDE_MIN} AND {LONGITUDE_MAX}
+            GROUP BY 1, 2, 3, 4
+        )
+"""
+
+
+class FonteBigQuery(FonteDados):
+    remota = True
+
+    def __init__(self, client, inferencia="bigquery"):
+        # inferencia: "bigquery" (ML.PREDICT) ou "local" (NumPy, ver cocada.modelo)
+        self.client = client
+        self.inferencia = inferencia
+        self._modelos = None
+        self._modelos_conferidos_em = None
+        self._storage = None
+        self.disjuntor = Disjuntor("bigquery", FALHAS_DISJUNTOR, ESPERA_DISJUNTOR_S)
+
+    @classmethod
+    def de_credenciais(cls, credenciais, inferencia="bigquery"):
+        return cls(criar_cliente_bigquery(credenciais), inferencia=inferencia)
+
+    def modelos(self):
+        # Reaproveita a exportação (em memória ou no disco) enquanto a versão
+        # dos modelos no BigQuery for a mesma; a conferência é só de
+        # metadados e acontece no máximo a cada CONFERIR_MODELOS_S
+        agora = time.monotonic()
+        if self._modelos is not None and agora - self._modelos_conferidos_em < CONFERIR_MODELOS_S:
+            return self._modelos
+
+        modelos = self._modelos or ModelosExportados.ler()
+        try:
+            versao = ModelosExportados.versao_atual(self.client, MODELO_KMEANS, MODELO_PCA)
+        except Exception:
+            # Sem os metadados, segue com a exportação que já existe (se houver)
+            if modelos is None:
+                raise
+            versao = modelos.versao
+
+        if modelos is None or modelos.versao != versao:
+            modelos = ModelosExportados.exportar(self.client, MODELO_KMEANS, MODELO_PCA)
+            modelos.salvar()
+            metricas.contar("modelos_exportados_total")
+        self._modelos = modelos
+        self._modelos_conferidos_em = agora
+        return self._modelos
+
+    def _cliente_storage(self):
+        # Storage Read API (pacote google-cloud-bigquery-storage) quando
+        # instalada; sem ela os lotes vêm das páginas da API REST
+        if self._storage is None:
+            try:
+                from google.cloud import bigquery_storage
+            except ImportError:
+                self._storage = False
+            else:
+                self._storage = bigquery_storage.BigQueryReadClient(credentials=self.client._credentials)
+        return self._storage or None
+
+    def _resultado(self, query, parametros, prazo_s):
+        # Uma tentativa: o prazo vale para o envio, para a espera pelo job
+        # e para as novas tentativas internas da biblioteca (que por padrão
+        # esperariam até 10 minutos); no servidor o job é cancelado se passar
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(query_parameters=list(parametros))
+        job_config.job_timeout_ms = int(prazo_s * 1000)
+        retry = bigquery.DEFAULT_RETRY.with_timeout(prazo_s)
+        job = self.client.query(query, job_config=job_config, retry=retry, timeout=prazo_s, job_retry=None)
+        try:
+            return job.result(page_size=TAMANHO_PAGINA, retry=retry, timeout=prazo_s, job_retry=None)
+        except Exception:
+            # Um job que estourou o prazo não fica rodando (e cobrando)
+            try:
+                job.cancel()
+            except Exception:
+                pass
+            raise
+
+    def _lotes(self, query, parametros=(), progresso=None):
+        try:
+            self.disjuntor.permitir()
+        except CircuitoAberto as e:
+            raise ConsultaFalhou(f"BigQuery fora do ar ({e})") from e
+
+        # Tempo da consulta (envio + espera pelo job) separado do download
+        try:
+            with metricas.etapa("bigquery_consulta"):
+                linhas = com_tentativas(
+                    lambda restante: self._resultado(query, parametros, restante),
+                    PRAZO_CONSULTA_S, TENTATIVAS_CONSULTA, erro_transitorio, nome="bigquery",
+                )
+        except Exception as e:
+            self.disjuntor.falha()
+            raise ConsultaFalhou(f"BigQuery não respondeu: {e}") from e
+        self.disjuntor.sucesso()
+
+        lidas = 0
+        lotes = iter(linhas.to_arrow_iterable(bqstorage_client=self._cliente_storage()))
+        while True:
+            # Só o tempo de chegada de cada lote; o processamento de quem
+            # consome o gerador fica de fora
+            try:
+                with metricas.etapa("bigquery_download"):
+                    lote = next(lotes, None)
+            except Exception as e:
+                self.disjuntor.falha()
+                raise ConsultaFalhou(f"Download do BigQuery interrompido: {e}") from e
+            if lote is None:
+                break
+            lidas += lote.num_rows
+            metricas.contar("bigquery_linhas_total", lote.num_rows)
+            if progresso is not None:
+                progresso(lidas, linhas.total_rows)
+            yield lote
+
+    def _executar(self, query, parametros=(), colunas=()):
+        return lotes_para_dataframe(self._lotes(query, parametros), list(colunas))
+
+    def resumo(self, desde=None, ate=None, linhas=None):
+        return lotes_para_dataframe(self.resumo_lotes(desde, ate=ate, linhas=linhas), COLUNAS_RESUMO)
+
+    def resumo_lotes(self, desde=None, progresso=None, ate=None, linhas=None):
+        query, parametros = self._query_resumo(desde, ate, linhas)
+        for lote in self._lotes(query, parametros, progresso):
+            if self.inferencia == "local":
+                # Cluster e componentes calculados lote a lote
+                previsto = self.modelos().prever(lote.to_pandas())[COLUNAS_RESUMO]
+                lote = pa.RecordBatch.from_pandas(previsto, preserve_index=False)
+            yield estreitar_lote(lote, COLUNAS_RESUMO)
+
+    def _query_resumo(self, desde=None, ate=None, linhas=None):
+        from google.cloud import bigquery
+
+        # Período e linhas vão como parâmetros da consulta. O filtro direto
+        # em `data` permite ao BigQuery descartar partições: os bytes lidos
+        # acompanham o período pedido, não a tabela inteira.
+        filtro = "tempo_total_fundao IS NOT NULL"
+        parametros = []
+        if desde is not None:
+            filtro += " AND data >= @desde"
+            parametros.append(bigquery.ScalarQueryParameter("desde", "DATE", desde))
+        if ate is not None:
+            filtro += " AND data <= @ate"
+            parametros.append(bigquery.ScalarQueryParameter("ate", "DATE", ate))
+        if linhas is not None:
+            filtro += " AND linha IN UNNEST(@linhas)"
+            parametros.append(bigquery.ArrayQueryParameter("linhas", "STRING", sorted(map(str, linhas))))
+
+        if self.inferencia == "local":
+            # Só as colunas brutas usadas; cluster e componentes são calculados aqui
+            modelos = self.modelos()
+            colunas = dict.fromkeys(
+                ["linha", "data", "tempo_total_fundao", "prop_atrasadas", "velocidade_media_fundao"]
+                + modelos.kmeans["features"] + modelos.pca["features"]
+            )
+            return f"SELECT {', '.join(colunas)} FROM {TABELA_RESUMO} WHERE {filtro}", parametros
+
+        query = f"""
+        WITH dados_kmeans AS (
+            SELECT * FROM ML.PREDICT(MODEL {MODELO_KMEANS},
+                (SELECT * FROM {TABELA_RESUMO} WHERE {filtro}))
+        ),
+        dados_pca AS (
+            SELECT * FROM ML.PREDICT(MODEL {MODELO_PCA},
+                (SELECT * FROM {TABELA_RESUMO} WHERE {filtro}))
+        )
+        SELECT
+            k.linha,
+            k.data,
+            k.tempo_total_fundao,
+            k.prop_atrasadas,
+            k.velocidade_media_fundao,
+            CAST(k.centroid_id AS STRING) as cluster_id,
+            p.principal_component_1 as pc1,
+            p.principal_component_2 as pc2
+        FROM dados_kmeans k
+        JOIN dados_pca p
+          ON k.linha = p.linha AND k.data = p.data
+        """
+        return query, parametros
+
+    def gps(self, inicio=DATA_MAPA, fim=DATA_MAPA):
+        if self.inferencia == "local":
+            return self._gps_inferencia_local(inicio, fim)
+
+        # Em vez de pontos crus (antes LIMIT 5000), contagens por célula da
+        # grade: o período inteiro cabe num resultado de tamanho limitado
+        query_mapa = f"""
+        WITH classificacao_do_periodo AS (
+            SELECT linha, data, centroid_id as cluster_id
+            FROM ML.PREDICT(MODEL {MODELO_KMEANS},
+                (SELECT * FROM {TABELA_RESUMO} WHERE data BETWEEN @inicio AND @fim))
+        ),
+        {SQL_CELULAS_GPS}
+        SELECT
+            g.linha,
+            CAST(c.cluster_id AS STRING) as cluster_id,
+            g.celula_lat,
+            g.celula_lon,
+            SUM(g.pontos) as pontos
+        FROM celulas_gps g
+        JOIN classificacao_do_periodo c ON g.linha = c.linha AND g.data = c.data
+        GROUP BY 1, 2, 3, 4
+        """
+        return self._executar(query_mapa, self._parametros_periodo(inicio, fim), COLUNAS_GPS)
+
+    def periodo(self):
+        dias = self._executar(f"SELECT MIN(data) AS primeiro, MAX(data) AS ultimo FROM {TABELA_RESUMO}")
+        primeiro, ultimo = dias.iloc[0]
+        return pd.Timestamp(primeiro).date(), pd.Timestamp(ultimo).date()
+
+    def _parametros_periodo(self, inicio, fim):
+        from google.cloud import bigquery
+
+        return [
+            bigquery.ScalarQueryParameter("inicio", "DATE", inicio),
+            bigquery.ScalarQueryParameter("fim", "DATE", fim),
+        ]
+
+    def celulas_gps(self, inicio, fim):
+        return self._executar(
+            f"WITH {SQL_CELULAS_GPS} SELECT * FROM celulas_gps",
+            self._parametros_periodo(inicio, fim), COLUNAS_CELULAS_DIA,
+        )
+
+    def _gps_inferencia_local(self, inicio, fim):
+        parametros = self._parametros_periodo(inicio, fim)
+
+        # 1. Classificação de cada (linha, dia) feita localmente, sem ML.PREDICT
+        features = ", ".join(dict.fromkeys(self.modelos().kmeans["features"]))
+        dias = self._executar(
+            f"SELECT linha, data, {features} FROM {TABELA_RESUMO} WHERE data BETWEEN @inicio AND @fim", parametros
+        )
+        classificacao = pd.DataFrame({
+            "linha": dias["linha"].astype(str),
+            "data": pd.to_datetime(dias["data"]),
+            "cluster_id": self.modelos().prever_clusters(dias),
+        }).drop_duplicates(["linha", "data"])
+
+        # 2. Células de GPS por linha e dia, juntadas à classificação aqui
+        celulas = self.celulas_gps(inicio, fim)
+        celulas = celulas.assign(linha=celulas["linha"].astype(str), data=pd.to_datetime(celulas["data"]))
+        return (
+            celulas.merge(classificacao, on=["linha", "data"], how="inner")
+            .groupby(COLUNAS_GPS[:-1], as_index=False)["pontos"].sum()
+        )
+
+
+def erro_transitorio(erro):
+    # Vale tentar de novo: prazo, conexão, erro 5xx ou cota (429)
+    import requests
+    from google.api_core import exceptions
+
+    return isinstance(erro, (
+        TimeoutError, ConnectionError, requests.exceptions.RequestException,
+        exceptions.ServerError, exceptions.TooManyRequests, exceptions.RetryError,
+    ))
+
+
+def criar_cliente_bigquery(credenciais):
+    # Cliente com pool de conexões HTTP: como ele é compartilhado entre as
+    # sessões, as consultas reaproveitam o token e as conexões já abertas.
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from google.oauth2 import service_account
+    from requests.adapters import HTTPAdapter
+
+    creds = service_account.Credentials.from_service_account_info(
+        credenciais, scopes=bigquery.Client.SCOPE
+    )
+    sessao = AuthorizedSession(creds)
+    adaptador = HTTPAdapter(pool_connections=TAMANHO_POOL_HTTP, pool_maxsize=TAMANHO_POOL_HTTP)
+    sessao.mount("https://", adaptador)
+
+    return bigquery.Client(credentials=creds, project=BILLING_PROJECT_ID, _http=sessao)
+
+
+# ======================================================================
+# LOCAL (DUCKDB SOBRE PARQUET)
+# ======================================================================
+# Estrutura esperada do diretório (funciona sem rede e sem GCP):
+#
+#   <dados_locais>/resumo/**/*.parquet  -> COLUNAS_RESUMO (aceita a pasta do
+#                                          snapshot local, particionada por data=)
+#   <dados_locais>/gps/**/*.parquet     -> colunas de gps_onibus: servico, data,
+#                                          latitude, longitude, timestamp_gps
+
+
+class FonteLocal(FonteDados):
+    def __init__(self, diretorio=DIRETORIO_LOCAL_PADRAO):
+        self.diretorio = Path(diretorio)
+
+    def _arquivos(self, tabela):
+        pasta = self.diretorio / tabela
+        if not pasta.exists():
+            raise FonteIndisponivel(f"Pasta de dados locais não encontrada: {pasta}")
+        return f"read_parquet('{pasta.as_posix()}/**/*.parquet', hive_partitioning = true)"
+
+    def _executar(self, query, parametros=None):
+        import duckdb
+
+        with metricas.etapa("duckdb_consulta"), duckdb.connect() as con:
+            return con.execute(query, parametros).df()
+
+    def resumo(self, desde=None, ate=None, linhas=None):
+        # Com a pasta particionada por data= o DuckDB só abre as partições do período
+        filtro = "tempo_total_fundao IS NOT NULL"
+        parametros = {}
+        if desde is not None:
+            filtro += " AND CAST(data AS DATE) >= CAST($desde AS DATE)"
+            parametros["desde"] = str(desde)
+        if ate is not None:
+            filtro += " AND CAST(data AS DATE) <= CAST($ate AS DATE)"
+            parametros["ate"] = str(ate)
+        if linhas is not None:
+            filtro += " AND list_contains($linhas, CAST(linha AS VARCHAR))"
+            parametros["linhas"] = sorted(map(str, linhas))
+
+        query = f"""
+        SELECT
+            CAST(linha AS VARCHAR) AS linha,
+            CAST(data AS DATE) AS data,
+            tempo_total_fundao,
+            prop_atrasadas,
+            velocidade_media_fundao,
+            CAST(cluster_id AS VARCHAR) AS cluster_id,
+            pc1,
+            pc2
+        FROM {self._arquivos("resumo")}
+        WHERE {filtro}
+        """
+        return self._executar(query, parametros)
+
+    def _sql_celulas_gps(self):
+        return f"""
+        celulas_gps AS (
+            SELECT
+                CAST(servico AS VARCHAR) AS linha,
+                CAST(data AS DATE) AS data,
+                CAST(FLOOR((latitude - ({LATITUDE_MIN})) / {PASSO_GRADE}) AS BIGINT) AS celula_lat,
+                CAST(FLOOR((longitude - ({LONGITUDE_MIN})) / {PASSO_GRADE}) AS BIGINT) AS celula_lon,
+                COUNT(*) AS pontos
+            FROM {self._arquivos("gps")}
+            WHERE CAST(data AS DATE) BETWEEN CAST($inicio AS DATE) AND CAST($fim AS DATE)
+              AND latitude BETWEEN {LATITUDE_MIN} AND {LATITUDE_MAX}
+              AND longitude BETWEEN {LONGITUDE_MIN} AND {LONGITUDE_MAX}
+            GROUP BY 1, 2, 3, 4
+        )
+        """
+
+    def gps(self, inicio=DATA_MAPA, fim=DATA_MAPA):
+        query_mapa = f"""
+        WITH classificacao_do_periodo AS (
+            SELECT CAST(linha AS VARCHAR) AS linha, CAST(data AS DATE) AS data, cluster_id
+            FROM {self._arquivos("resumo")}
+            WHERE CAST(data AS DATE) BETWEEN CAST($inicio AS DATE) AND CAST($fim AS DATE)
+        ),
+        {self._sql_celulas_gps()}
+        SELECT
+            g.linha,
+            CAST(c.cluster_id AS VARCHAR) AS cluster_id,
+            g.celula_lat,
+            g.celula_lon,
+            SUM(g.pontos) AS pontos
+        FROM celulas_gps g
+        JOIN classificacao_do_periodo c ON g.linha = c.linha AND g.data = c.data
+        GROUP BY 1, 2, 3, 4
+        """
+        return self._executar(query_mapa, {"inicio": str(inicio), "fim": str(fim)})
+
+    def celulas_gps(self, inicio, fim):
+        query = f"WITH {self._sql_celulas_gps()} SELECT * FROM celulas_gps"
+        return self._executar(query, {"inicio": str(inicio), "fim": str(fim)})
+
+    def periodo(self):
+        query = f"SELECT MIN(CAST(data AS DATE)), MAX(CAST(data AS DATE)) FROM {self._arquivos('resumo')}"
+        primeiro, ultimo = self._executar(query).iloc[0]
+        return pd.Timestamp(primeiro).date(), pd.Timestamp(ultimo).date()
+
+
+# ======================================================================
+# ARTEFATO PRÉ-CALCULADO (python -m cocada.precalcular)
+# ======================================================================
+# Resumo com cluster e componentes já previstos e células de GPS já
+# classificadas, gravados uma vez por atualização dos dados (ver
+# cocada.artefato). O painel só lê arquivos locais: nada de ML.PREDICT
+# nem de espera pelo BigQuery na subida do processo.
+
+
+class FonteArtefato(FonteLocal):
+    def __init__(self, diretorio=artefato.DIRETORIO_PADRAO, versao=None):
+        try:
+            self.artefato = artefato.abrir(diretorio, versao)
+        except (FileNotFoundError, ValueError) as e:
+            raise FonteIndisponivel(f"Artefato pré-calculado indisponível: {e}") from e
+        self.diretorio_artefatos = diretorio
+        self.versao = self.artefato["versao"]
+        super().__init__(self.artefato["caminho"])
+
+    def atualizada(self):
+        # O artefato publicado por último (ponteiro ATUAL)
+        if artefato.versao_atual(self.diretorio_artefatos) == self.versao:
+            return self
+        return FonteArtefato(self.diretorio_artefatos)
+
+    def gps(self, inicio=DATA_MAPA, fim=DATA_MAPA):
+        query_mapa = f"""
+        SELECT
+            CAST(linha AS VARCHAR) AS linha,
+            CAST(cluster_id AS VARCHAR) AS cluster_id,
+            celula_lat,
+            celula_lon,
+            SUM(pontos) AS pontos
+        FROM {self._arquivos(artefato.TABELA_GPS)}
+        WHERE data BETWEEN CAST($inicio AS DATE) AND CAST($fim AS DATE)
+        GROUP BY 1, 2, 3, 4
+        """
+        return self._executar(query_mapa, {"inicio": str(inicio), "fim": str(fim)})
+
+    def celulas_gps(self, inicio, fim):
+        raise FonteIndisponivel("O artefato guarda as células já classificadas, sem os pontos brutos")
+
+    def periodo(self):
+        tabela = self.artefato["tabelas"][artefato.TABELA_RESUMO]
+        return date.fromisoformat(tabela["primeiro_dia"]), date.fromisoformat(tabela["ultimo_dia"])
+
+
+# ======================================================================
+# ESCOLHA DA FONTE (config "fonte": "bigquery", "local" ou "artefato";
+# config "inferencia": "bigquery" ou "local" para o K-Means/PCA)
+# ======================================================================
+
+
+def criar_fonte(nome=None, credenciais=None):
+    nome = nome or config.obter("fonte", "bigquery")
+
+    if nome == "local":
+        return FonteLocal(config.obter("dados_locais", DIRETORIO_LOCAL_PADRAO))
+
+    if nome == "artefato":
+        return FonteArtefato(config.obter("artefatos", artefato.DIRETORIO_PADRAO))
+
+    if nome == "bigquery":
+        if credenciais is None:
+            raise FonteIndisponivel("Secrets não encontradas.")
+        return FonteBigQuery.de_credenciais(credenciais, inferencia=config.obter("inferencia", "bigquery"))
+
+    raise ValueError(f"Fonte de dados desconhecida: {nome}")
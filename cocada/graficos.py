@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from cocada import config
+from cocada.esquema import rotulos_cluster
+from cocada.mapa import CENTRO_FUNDAO, tamanho_marcadores
+
+
+# ======================================================================
+# GRÁFICOS DE DISPERSÃO COM RENDERIZAÇÃO ADAPTATIVA
+# ======================================================================
+# Até LIMITE_PONTOS os gráficos mostram cada ponto exatamente (SVG). Acima
+# disso os pontos são agregados numa grade 2D por cluster: cada célula
+# ocupada vira um marcador na média dos seus pontos, com tamanho
+# proporcional à quantidade de pontos que representa, desenhado em WebGL.
+# As regiões densas e esparsas continuam aparecendo, mas o JSON da figura
+# passa a ter tamanho limitado.
+
+LIMITE_PONTOS = int(config.obter("limite_pontos_grafico", 20_000))
+
+CORES = px.colors.qualitative.Bold
+
+
+def agregar_em_grade(df, x, y, limite_marcadores, medias=()):
+    dados = df.dropna(subset=[x, y])
+    n_clusters = max(dados["cluster_id"].nunique(), 1)
+
+    # Divisões por eixo para que clusters × células não passem do limite
+    divisoes = max(int(np.sqrt(limite_marcadores / n_clusters)), 1)
+
+    def celula(coluna):
+        valores = dados[coluna].to_numpy(dtype=np.float64)
+        minimo, maximo = valores.min(), valores.max()
+        largura = (maximo - minimo) or 1.0
+        return np.minimum(((valores - minimo) / largura * divisoes).astype(np.int64), divisoes - 1)
+
+    grade = pd.DataFrame({
+        "cluster_id": dados["cluster_id"].to_numpy(),
+        "celula": celula(x) * divisoes + celula(y),
+        x: dados[x].to_numpy(dtype=np.float64),
+        y: dados[y].to_numpy(dtype=np.float64),
+        **{coluna: dados[coluna].to_numpy(dtype=np.float64) for coluna in medias},
+    })
+
+    agregado = grade.groupby(["cluster_id", "celula"], sort=False).agg(
+        pontos=(x, "size"),
+        **{coluna: (coluna, "mean") for coluna in (x, y, *medias)},
+    )
+    return agregado.reset_index(level="celula", drop=True).reset_index()
+
+
+def modo_renderizacao(n_pontos, limite=LIMITE_PONTOS):
+    return "exato" if n_pontos <= limite else "agregado"
+
+
+def _representacao(df_filtrado, figura_dados, limite):
+    modo = modo_renderizacao(len(df_filtrado), limite)
+    return {"modo": modo, "pontos": len(df_filtrado), "marcadores": len(figura_dados)}
+
+
+def figura_causa_efeito(df_filtrado, limite=LIMITE_PONTOS):
+    labels = {
+        "tempo_total_fundao": "Tempo Total no Fundão (minutos)",
+        "prop_atrasadas": "Proporção de Viagens Atrasadas",
+        "cluster_id": "Cluster",
+        "pontos": "Pontos representados",
+        "velocidade_media_fundao": "Velocidade média",
+    }
+
+    if len(df_filtrado) <= limite:
+        dados = df_filtrado
+        fig_scatter = px.scatter(
+            dados,
+            x="tempo_total_fundao",
+            y="prop_atrasadas",
+            color=rotulos_cluster(dados["cluster_id"]),
+            size="velocidade_media_fundao",
+            hover_data=["linha", "data"],
+            title="Tempo no Fundão × Proporção de Atrasos",
+            color_discrete_sequence=CORES,
+            height=600,
+            labels=labels,
+        )
+    else:
+        dados = agregar_em_grade(
+            df_filtrado, "tempo_total_fundao", "prop_atrasadas", limite,
+            medias=["velocidade_media_fundao"],
+        )
+        fig_scatter = px.scatter(
+            dados,
+            x="tempo_total_fundao",
+            y="prop_atrasadas",
+            color=rotulos_cluster(dados["cluster_id"]),
+            size="pontos",
+            hover_data=["pontos", "velocidade_media_fundao"],
+            title="Tempo no Fundão × Proporção de Atrasos",
+            color_discrete_sequence=CORES,
+            height=600,
+            labels=labels,
+            render_mode="webgl",
+        )
+
+    fig_scatter.update_layout(plot_bgcolor='white')
+    fig_scatter.update_traces(marker=dict(line=dict(width=1, color='DarkSlateGrey')))
+    return fig_scatter, _representacao(df_filtrado, dados, limite)
+
+
+def figura_pca(df_filtrado, limite=LIMITE_PONTOS):
+    labels = {
+        "pc1": "Componente Principal 1",
+        "pc2": "Componente Principal 2",
+        "cluster_id": "Cluster",
+        "pontos": "Pontos representados",
+    }
+
+    if len(df_filtrado) <= limite:
+        dados = df_filtrado
+        fig_pca = px.scatter(
+            dados,
+            x="pc1",
+            y="pc2",
+            color=rotulos_cluster(dados["cluster_id"]),
+            hover_data=["linha", "tempo_total_fundao", "prop_atrasadas"],
+            title="Distribuição dos Clusters no Espaço PCA",
+            color_discrete_sequence=CORES,
+            height=600,
+            labels=labels,
+        )
+        fig_pca.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+    else:
+        dados = agregar_em_grade(
+            df_filtrado, "pc1", "pc2", limite,
+            medias=["tempo_total_fundao", "prop_atrasadas"],
+        )
+        fig_pca = px.scatter(
+            dados,
+            x="pc1",
+            y="pc2",
+            color=rotulos_cluster(dados["cluster_id"]),
+            size="pontos",
+            hover_data=["pontos", "tempo_total_fundao", "prop_atrasadas"],
+            title="Distribuição dos Clusters no Espaço PCA",
+            color_discrete_sequence=CORES,
+            height=600,
+            labels=labels,
+            render_mode="webgl",
+        )
+        fig_pca.update_traces(marker=dict(line=dict(width=1, color='DarkSlateGrey')))
+
+    fig_pca.update_layout(plot_bgcolor='white')
+    return fig_pca, _representacao(df_filtrado, dados, limite)
+
+
+# ======================================================================
+# MAPA (CÉLULAS DA GRADE, VER cocada.mapa)
+# ======================================================================
+
+
+def figura_mapa(df_mapa, zoom):
+    fig_map = px.scatter_map(
+        df_mapa.assign(tamanho=tamanho_marcadores(df_mapa["pontos"])),
+        lat="latitude",
+        lon="longitude",
+        color=rotulos_cluster(df_mapa["cluster_id"]),
+        size="tamanho",
+        hover_data={"pontos": True, "linhas": True, "tamanho": False},
+        zoom=zoom,
+        center=CENTRO_FUNDAO,
+        height=700,
+        color_discrete_sequence=CORES,
+        title="Distribuição Espacial dos Clusters",
+        labels={"cluster_id": "Cluster", "pontos": "Pontos GPS", "linhas": "Linhas"},
+    )
+    fig_map.update_layout(
+        map_style="open-street-map",
+        margin={"r":0,"t":40,"l":0,"b":0}
+    )
+    return fig_map
+
+
+# ======================================================================
+# COMPARAÇÃO DIRETA (BOX PLOT)
+# ======================================================================
+
+
+def figura_box(caixas, ordem):
+    # Caixas montadas a partir dos quartis já calculados por linha × cluster
+    # (CuboAgregados.caixas): o navegador recebe cinco números por caixa em
+    # vez de todas as observações, então o JSON cresce com o número de
+    # linhas selecionadas e não com o número de dias. Sem as observações
+    # não há pontos de outlier; as cercas seguem a regra de 1,5 × IQR.
+    fig_box = go.Figure()
+    for numero, (cluster, grupo) in enumerate(caixas.groupby(level="cluster_id", sort=True)):
+        fig_box.add_trace(go.Box(
+            name=str(cluster),
+            legendgroup=str(cluster),
+            offsetgroup=str(cluster),
+            x=grupo.index.get_level_values("linha").astype(str).to_numpy(),
+            q1=grupo["q1"].to_numpy(),
+            median=grupo["mediana"].to_numpy(),
+            q3=grupo["q3"].to_numpy(),
+            lowerfence=grupo["cerca_inferior"].to_numpy(),
+            upperfence=grupo["cerca_superior"].to_numpy(),
+            marker_color=CORES[numero % len(CORES)],
+        ))
+
+    fig_box.update_layout(
+        title="Distribuição de Tempos por Linha (Box Plot)",
+        height=600,
+        boxmode="group",
+        legend_title_text="Cluster",
+        xaxis_title="Linha",
+        yaxis_title="Tempo Total no Fundão (minutos)",
+    )
+    fig_box.update_xaxes(type="category", categoryorder='array', categoryarray=[str(linha) for linha in ordem])
+    fig_box.update_layout(plot_bgcolor='white')
+    return fig_box
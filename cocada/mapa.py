@@ -0,0 +1,48 @@
+import numpy as np
+
+from cocada.fontes import LATITUDE_MAX, LATITUDE_MIN, LONGITUDE_MAX, LONGITUDE_MIN, PASSO_GRADE
+
+
+# ======================================================================
+# GRADE ESPACIAL DO MAPA EM VÁRIAS RESOLUÇÕES
+# ======================================================================
+# As fontes devolvem contagens na grade mais fina (PASSO_GRADE). Para cada
+# nível de zoom as células são juntadas em blocos de FATOR × FATOR, então o
+# número de marcadores fica limitado pelo tamanho da caixa do Fundão e não
+# pela quantidade de pontos de GPS do período.
+
+# Nível de zoom do mapa -> quantas células finas formam o lado de uma célula
+FATORES_ZOOM = {12: 8, 13: 4, 14: 2, 15: 1}
+ZOOM_PADRAO = 13
+
+CENTRO_FUNDAO = {
+    "lat": (LATITUDE_MIN + LATITUDE_MAX) / 2,
+    "lon": (LONGITUDE_MIN + LONGITUDE_MAX) / 2,
+}
+
+
+def celulas_para_zoom(df_celulas, zoom, linhas=None):
+    if linhas:
+        df_celulas = df_celulas[df_celulas["linha"].isin(linhas)]
+
+    fator = FATORES_ZOOM[zoom]
+    passo = PASSO_GRADE * fator
+    grade = df_celulas.assign(
+        celula_lat=df_celulas["celula_lat"] // fator,
+        celula_lon=df_celulas["celula_lon"] // fator,
+    )
+
+    agregado = grade.groupby(["cluster_id", "celula_lat", "celula_lon"], observed=True, as_index=False).agg(
+        pontos=("pontos", "sum"),
+        linhas=("linha", "nunique"),
+    )
+
+    # Marcador no centro de cada célula
+    agregado["latitude"] = LATITUDE_MIN + (agregado["celula_lat"] + 0.5) * passo
+    agregado["longitude"] = LONGITUDE_MIN + (agregado["celula_lon"] + 0.5) * passo
+    return agregado.drop(columns=["celula_lat", "celula_lon"])
+
+
+def tamanho_marcadores(pontos):
+    # Escala logarítmica: uma célula com muito tráfego não esconde as outras
+    return np.log1p(pontos)
@@ -0,0 +1,98 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# ======================================================================
+# CACHE LRU COM ORÇAMENTO DE MEMÓRIA
+# ======================================================================
+# Compartilhado entre sessões (um por processo). Quando o total estimado
+# passa do limite em bytes, os itens usados há mais tempo são descartados.
+# Os valores guardados são somente leitura: quem lê não deve alterá-los.
+
+
+def tamanho_em_bytes(objeto):
+    if hasattr(objeto, "to_plotly_json"):
+        # Figuras do Plotly: mede a especificação completa (dados + layout)
+        return tamanho_em_bytes(objeto.to_plotly_json())
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(objeto, pd.DataFrame) else uso)
+    if isinstance(objeto, pd.Index):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, dict):
+        return sys.getsizeof(objeto) + sum(tamanho_em_bytes(v) for v in objeto.values())
+    if isinstance(objeto, (list, tuple, set, frozenset)):
+        return sys.getsizeof(objeto) + sum(tamanho_em_bytes(v) for v in objeto)
+    return sys.getsizeof(objeto)
+
+
+class CacheLRU:
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.itens = OrderedDict()
+        self.tamanhos = {}
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.faltas = 0
+        self._trava = threading.Lock()
+
+    def obter(self, chave, contar_falta=True):
+        # contar_falta=False: a chave exata é só a primeira tentativa (ver procurar)
+        with self._trava:
+            if chave not in self.itens:
+                if contar_falta:
+                    self.faltas += 1
+                return None
+            self.acertos += 1
+            self.itens.move_to_end(chave)
+            return self.itens[chave]
+
+    def guardar(self, chave, valor):
+        tamanho = tamanho_em_bytes(valor)
+        with self._trava:
+            if chave in self.itens:
+                self.bytes_usados -= self.tamanhos.pop(chave)
+                del self.itens[chave]
+
+            # Um item maior que o orçamento inteiro não é guardado
+            if tamanho > self.limite_bytes:
+                return valor
+
+            self.itens[chave] = valor
+            self.tamanhos[chave] = tamanho
+            self.bytes_usados += tamanho
+
+            while self.bytes_usados > self.limite_bytes:
+                antiga, _ = self.itens.popitem(last=False)
+                self.bytes_usados -= self.tamanhos.pop(antiga)
+        return valor
+
+    def procurar(self, condicao):
+        # Primeiro item (do mais recente ao mais antigo) cuja chave satisfaz a condição
+        with self._trava:
+            for chave in reversed(self.itens):
+                if condicao(chave):
+                    self.acertos += 1
+                    self.itens.move_to_end(chave)
+                    return chave, self.itens[chave]
+            self.faltas += 1
+        return None, None
+
+    def obter_ou_calcular(self, chave, calcular):
+        valor = self.obter(chave)
+        if valor is None:
+            valor = self.guardar(chave, calcular())
+        return valor
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "itens": len(self.itens),
+                "bytes_usados": self.bytes_usados,
+                "limite_bytes": self.limite_bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+            }
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# MÉTRICAS DE TEMPO, CACHE E MEMÓRIA
+# ======================================================================
+# Registro único por processo. Cada etapa medida (consulta no BigQuery,
+# download dos lotes, normalização, filtro, figuras...) acumula contagem,
+# soma, último valor e máximo; os contadores guardam acertos/faltas dos
+# loaders em cache. O conteúdo é exportado num arquivo texto no formato do
+# Prometheus (node_exporter textfile) e cada execução do script gera uma
+# linha de log em JSON no logger "cocada.metricas".
+
+ARQUIVO_PADRAO = str(RAIZ_PROJETO / ".cache" / "metricas.prom")
+# Intervalo mínimo entre duas gravações do arquivo (várias sessões rodando)
+INTERVALO_GRAVACAO_S = 10
+
+log = logging.getLogger("cocada.metricas")
+
+_local = threading.local()
+
+
+def _rotulos(rotulos):
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _nome_etapa(nome, rotulos):
+    if not rotulos:
+        return nome
+    return f"{nome}[{','.join(valor for _, valor in rotulos)}]"
+
+
+class Metricas:
+    def __init__(self):
+        self.resumos = {}
+        self.contadores = {}
+        self.medidas = {}
+        self._trava = threading.Lock()
+        self._ultima_gravacao = 0.0
+
+    def observar(self, nome, valor, **rotulos):
+        chave = (nome, _rotulos(rotulos))
+        with self._trava:
+            resumo = self.resumos.setdefault(chave, {"contagem": 0, "soma": 0.0, "ultimo": 0.0, "maximo": 0.0})
+            resumo["contagem"] += 1
+            resumo["soma"] += valor
+            resumo["ultimo"] = valor
+            resumo["maximo"] = max(resumo["maximo"], valor)
+
+    def contar(self, nome, quantidade=1, **rotulos):
+        chave = (nome, _rotulos(rotulos))
+        with self._trava:
+            self.contadores[chave] = self.contadores.get(chave, 0) + quantidade
+
+    def definir(self, nome, valor, **rotulos):
+        with self._trava:
+            self.medidas[(nome, _rotulos(rotulos))] = valor
+
+    @contextmanager
+    def etapa(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.observar("etapa_segundos", duracao, etapa=nome, **rotulos)
+            execucao = getattr(_local, "execucao", None)
+            if execucao is not None:
+                execucao.somar(_nome_etapa(nome, _rotulos(rotulos)), duracao)
+
+    # ------------------------------------------------------------------
+    # Exportação
+    # ------------------------------------------------------------------
+
+    def tabela_etapas(self):
+        with self._trava:
+            return {
+                _nome_etapa(dict(rotulos)["etapa"], [r for r in rotulos if r[0] != "etapa"]): dict(resumo)
+                for (nome, rotulos), resumo in self.resumos.items()
+                if nome == "etapa_segundos"
+            }
+
+    def tabela_contador(self, nome):
+        with self._trava:
+            return [
+                {**dict(rotulos), "valor": valor}
+                for (outro, rotulos), valor in sorted(self.contadores.items())
+                if outro == nome
+            ]
+
+    def texto_prometheus(self):
+        def serie(nome, rotulos, valor):
+            texto = ",".join(f'{chave}="{valor_rotulo}"' for chave, valor_rotulo in rotulos)
+            return f"cocada_{nome}{{{texto}}} {valor}" if texto else f"cocada_{nome} {valor}"
+
+        with self._trava:
+            linhas = []
+            for nome in sorted({nome for nome, _ in self.resumos}):
+                linhas.append(f"# TYPE cocada_{nome} summary")
+                for (outro, rotulos), resumo in sorted(self.resumos.items()):
+                    if outro == nome:
+                        linhas.append(serie(f"{nome}_count", rotulos, resumo["contagem"]))
+                        linhas.append(serie(f"{nome}_sum", rotulos, round(resumo["soma"], 6)))
+                linhas.append(f"# TYPE cocada_{nome}_max gauge")
+                for (outro, rotulos), resumo in sorted(self.resumos.items()):
+                    if outro == nome:
+                        linhas.append(serie(f"{nome}_max", rotulos, round(resumo["maximo"], 6)))
+            for nome in sorted({nome for nome, _ in self.contadores}):
+                linhas.append(f"# TYPE cocada_{nome} counter")
+                for (outro, rotulos), valor in sorted(self.contadores.items()):
+                    if outro == nome:
+                        linhas.append(serie(nome, rotulos, valor))
+            for nome in sorted({nome for nome, _ in self.medidas}):
+                linhas.append(f"# TYPE cocada_{nome} gauge")
+                for (outro, rotulos), valor in sorted(self.medidas.items()):
+                    if outro == nome:
+                        linhas.append(serie(nome, rotulos, valor))
+        return "\n".join(linhas) + "\n"
+
+    def gravar_prometheus(self, caminho=None, forcar=False):
+        caminho = config.obter("arquivo_metricas", ARQUIVO_PADRAO) if caminho is None else caminho
+        if not caminho:
+            return None
+
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_gravacao < INTERVALO_GRAVACAO_S:
+            return None
+        self._ultima_gravacao = agora
+
+        # Gravação atômica: quem coleta o arquivo nunca vê metade dele
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_name(f".{caminho.name}.{uuid.uuid4().hex}")
+        temporario.write_text(self.texto_prometheus())
+        os.replace(temporario, caminho)
+        return caminho
+
+
+REGISTRO = Metricas()
+
+etapa = REGISTRO.etapa
+observar = REGISTRO.observar
+contar = REGISTRO.contar
+definir = REGISTRO.definir
+
+
+# ======================================================================
+# EXECUÇÃO DO SCRIPT (RERUN OU FRAGMENTO)
+# ======================================================================
+# Guarda os tempos das etapas de uma execução, para o painel de depuração
+# mostrar de onde veio a latência daquele rerun específico.
+
+
+class Execucao:
+    def __init__(self, nome, **rotulos):
+        self.nome = nome
+        self.rotulos = rotulos
+        self.etapas = {}
+        self.inicio = time.perf_counter()
+        self.duracao = None
+        self._anterior = getattr(_local, "execucao", None)
+        _local.execucao = self
+
+    def somar(self, etapa_nome, duracao):
+        self.etapas[etapa_nome] = self.etapas.get(etapa_nome, 0.0) + duracao
+
+    def finalizar(self, **extras):
+        self.duracao = time.perf_counter() - self.inicio
+        REGISTRO.observar("execucao_segundos", self.duracao, execucao=self.nome)
+        _local.execucao = self._anterior
+        if self._anterior is not None:
+            # Fragmento rodando dentro de um rerun completo
+            self._anterior.somar(self.nome, self.duracao)
+
+        log.info(json.dumps({
+            "evento": "execucao",
+            "execucao": self.nome,
+            **self.rotulos,
+            "duracao_s": round(self.duracao, 6),
+            "etapas_s": {nome: round(valor, 6) for nome, valor in self.etapas.items()},
+            **extras,
+        }, ensure_ascii=False))
+        REGISTRO.gravar_prometheus()
+        return self
+
+
+def iniciar_execucao(nome, **rotulos):
+    return Execucao(nome, **rotulos)
+
+
+def memoria_processo_pico():
+    # Pico de memória residente do processo (ru_maxrss vem em KiB no Linux)
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ======================================================================
+# ACERTOS E FALTAS DOS LOADERS EM CACHE
+# ======================================================================
+# O corpo de uma função com st.cache_data/st.cache_resource só roda na
+# falta, e pode rodar em qualquer thread: a da página, a da pré-carga ou a
+# da atualização em segundo plano. Por isso registrar_falta conta a falta
+# direto no registro do processo, por loader. chamar_loader (usado pela
+# página) conta um acerto quando a chamada termina sem o corpo ter rodado
+# na própria thread: os dados vieram do cache ou de uma carga feita em
+# outra thread, que já contou a sua falta.
+
+
+def registrar_falta(loader):
+    contar("cache_loader_total", loader=loader, resultado="falta")
+    faltas = getattr(_local, "faltas", None)
+    if faltas is not None:
+        faltas.add(loader)
+
+
+def chamar_loader(loader, funcao, *args, **kwargs):
+    anteriores = getattr(_local, "faltas", None)
+    _local.faltas = faltas = set()
+    try:
+        with etapa(loader):
+            resultado = funcao(*args, **kwargs)
+    finally:
+        _local.faltas = anteriores
+    if loader not in faltas:
+        contar("cache_loader_total", loader=loader, resultado="acerto")
+    return resultado
@@ -0,0 +1,170 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# INFERÊNCIA LOCAL DO K-MEANS E DO PCA
+# ======================================================================
+# Em vez de rodar ML.PREDICT duas vezes no BigQuery (e depois o JOIN), os
+# parâmetros dos modelos são exportados uma vez (centróides, cargas do PCA,
+# média e desvio de cada feature) e a previsão é feita aqui com NumPy.
+# Junto vai a data de modificação de cada modelo no BigQuery (versao): se
+# um modelo for treinado de novo, a exportação deixa de valer e é refeita.
+
+ARQUIVO_MODELOS = config.obter("arquivo_modelos", str(RAIZ_PROJETO / ".cache" / "modelos.json"))
+
+# Linhas processadas por vez, para não montar matrizes enormes de uma só vez
+TAMANHO_LOTE = 200_000
+
+
+class ModelosExportados:
+    def __init__(self, kmeans, pca, versao=None):
+        # kmeans: features, media, desvio, padronizar, distancia, ids, centroides
+        # pca: features, media, desvio, escalar, cargas (features x componentes)
+        # versao: {"kmeans": ..., "pca": ...} com a modificação de cada modelo
+        self.kmeans = kmeans
+        self.pca = pca
+        self.versao = versao
+
+    # ------------------------------------------------------------------
+    # Exportação (BigQuery -> dicionário) e persistência em disco
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _versao(modelo):
+        # Muda a cada novo treino (CREATE OR REPLACE MODEL)
+        return modelo.modified.isoformat() if modelo.modified is not None else None
+
+    @classmethod
+    def versao_atual(cls, client, modelo_kmeans, modelo_pca):
+        # Só os metadados dos modelos (get_model), sem consulta
+        return {
+            "kmeans": cls._versao(client.get_model(modelo_kmeans.replace("`", ""))),
+            "pca": cls._versao(client.get_model(modelo_pca.replace("`", ""))),
+        }
+
+    @classmethod
+    def exportar(cls, client, modelo_kmeans, modelo_pca):
+        def consultar(query):
+            return client.query(query).to_dataframe(create_bqstorage_client=False)
+
+        def opcoes_treino(modelo):
+            runs = modelo.training_runs or [{}]
+            return runs[-1].get("trainingOptions", {})
+
+        # Metadados lidos antes dos parâmetros: se um treino terminar no meio
+        # da exportação, a versão gravada é a antiga e a próxima conferência
+        # exporta de novo
+        metadados_kmeans = client.get_model(modelo_kmeans.replace("`", ""))
+        metadados_pca = client.get_model(modelo_pca.replace("`", ""))
+
+        info_kmeans = consultar(f"SELECT * FROM ML.FEATURE_INFO(MODEL {modelo_kmeans})")
+        centroides = consultar(
+            f"SELECT centroid_id, feature, numerical_value "
+            f"FROM ML.CENTROIDS(MODEL {modelo_kmeans}, STRUCT(TRUE AS standardize))"
+        )
+        info_pca = consultar(f"SELECT * FROM ML.FEATURE_INFO(MODEL {modelo_pca})")
+        componentes = consultar(
+            f"SELECT principal_component_id, feature, numerical_value "
+            f"FROM ML.PRINCIPAL_COMPONENTS(MODEL {modelo_pca})"
+        )
+
+        for info in (info_kmeans, info_pca):
+            if info["mean"].isna().any():
+                raise ValueError("Inferência local só suporta modelos com features numéricas.")
+
+        features_kmeans = info_kmeans["input"].tolist()
+        matriz_centroides = centroides.pivot(index="centroid_id", columns="feature", values="numerical_value")
+        treino_kmeans = opcoes_treino(metadados_kmeans)
+
+        features_pca = info_pca["input"].tolist()
+        cargas = componentes.pivot(index="feature", columns="principal_component_id", values="numerical_value")
+        treino_pca = opcoes_treino(metadados_pca)
+
+        return cls(
+            kmeans={
+                "features": features_kmeans,
+                "media": info_kmeans["mean"].astype(float).tolist(),
+                "desvio": info_kmeans["stddev"].astype(float).tolist(),
+                "padronizar": treino_kmeans.get("standardizeFeatures", True),
+                "distancia": treino_kmeans.get("distanceType", "EUCLIDEAN"),
+                "ids": [str(i) for i in matriz_centroides.index],
+                "centroides": matriz_centroides[features_kmeans].to_numpy().tolist(),
+            },
+            pca={
+                "features": features_pca,
+                "media": info_pca["mean"].astype(float).tolist(),
+                "desvio": info_pca["stddev"].astype(float).tolist(),
+                "escalar": treino_pca.get("scaleFeatures", True),
+                "cargas": cargas.loc[features_pca, [1, 2]].to_numpy().tolist(),
+            },
+            versao={"kmeans": cls._versao(metadados_kmeans), "pca": cls._versao(metadados_pca)},
+        )
+
+    @classmethod
+    def ler(cls, caminho=ARQUIVO_MODELOS):
+        if not Path(caminho).exists():
+            return None
+        with open(caminho) as f:
+            return cls(**json.load(f))
+
+    def salvar(self, caminho=ARQUIVO_MODELOS):
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w") as f:
+            json.dump({"kmeans": self.kmeans, "pca": self.pca, "versao": self.versao}, f)
+        os.replace(temporario, caminho)
+
+    # ------------------------------------------------------------------
+    # Previsão vetorizada
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _padronizar(df, parametros, aplicar_escala):
+        x = df[parametros["features"]].to_numpy(dtype=np.float64)
+        x = x - np.asarray(parametros["media"])
+        if aplicar_escala:
+            desvio = np.asarray(parametros["desvio"])
+            x = x / np.where(desvio > 0, desvio, 1.0)
+        # Como no BigQuery ML, valores ausentes são imputados pela média (0 após centrar)
+        return np.nan_to_num(x, nan=0.0)
+
+    def prever_clusters(self, df):
+        p = self.kmeans
+        centroides = np.asarray(p["centroides"])
+        ids = np.asarray(p["ids"], dtype=object)
+        resultado = np.empty(len(df), dtype=object)
+
+        for inicio in range(0, len(df), TAMANHO_LOTE):
+            lote = df.iloc[inicio:inicio + TAMANHO_LOTE]
+            x = self._padronizar(lote, p, p["padronizar"])
+            if p["distancia"] == "COSINE":
+                normas = np.linalg.norm(x, axis=1, keepdims=True) * np.linalg.norm(centroides, axis=1)
+                distancias = 1 - (x @ centroides.T) / np.where(normas > 0, normas, 1.0)
+            else:
+                # |x - c|² = |x|² - 2 x·c + |c|² (o termo |x|² não muda o argmin)
+                distancias = (centroides ** 2).sum(axis=1) - 2 * (x @ centroides.T)
+            resultado[inicio:inicio + TAMANHO_LOTE] = ids[distancias.argmin(axis=1)]
+
+        return pd.Series(resultado, index=df.index, name="cluster_id")
+
+    def prever_componentes(self, df):
+        p = self.pca
+        cargas = np.asarray(p["cargas"])
+        resultado = np.empty((len(df), 2))
+
+        for inicio in range(0, len(df), TAMANHO_LOTE):
+            lote = df.iloc[inicio:inicio + TAMANHO_LOTE]
+            resultado[inicio:inicio + TAMANHO_LOTE] = self._padronizar(lote, p, p["escalar"]) @ cargas
+
+        return pd.DataFrame(resultado, index=df.index, columns=["pc1", "pc2"])
+
+    def prever(self, df):
+        return df.assign(cluster_id=self.prever_clusters(df)).join(self.prever_componentes(df))
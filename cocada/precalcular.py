@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import time
+import tomllib
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cocada import artefato, config
+from cocada.config import RAIZ_PROJETO
+from cocada.esquema import TIPOS_LOTE
+from cocada.fontes import COLUNAS_RESUMO, criar_fonte
+
+
+# ======================================================================
+# PRÉ-CÁLCULO DO ARTEFATO DE PREVISÕES
+# ======================================================================
+# Roda uma vez por atualização dos dados, fora do painel: a consulta do
+# resumo com K-Means/PCA (a mesma do carregamento do painel) e as células
+# de GPS por dia, juntadas à classificação numa passada só aqui, em vez de
+# cada consulta do mapa refazer o ML.PREDICT. O resultado vira um artefato
+# versionado (ver cocada.artefato) que o painel abre com fonte = "artefato".
+#
+#   python -m cocada.precalcular --credenciais conta.json
+#   python -m cocada.precalcular --fonte local --desde 2025-01-01
+
+
+def credenciais_gcp(caminho=None):
+    # --credenciais, GOOGLE_APPLICATION_CREDENTIALS ou o mesmo secrets.toml do painel
+    caminho = caminho or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if caminho:
+        with open(caminho) as f:
+            return json.load(f)
+    secrets = RAIZ_PROJETO / ".streamlit" / "secrets.toml"
+    if secrets.exists():
+        with open(secrets, "rb") as f:
+            return tomllib.load(f).get("gcp_service_account")
+    return None
+
+
+def tabela_resumo(fonte, desde, ate):
+    lotes = list(fonte.resumo_lotes(desde=desde, ate=ate, progresso=mostrar_progresso))
+    if not lotes:
+        raise SystemExit("❌ Nenhum registro no resumo para o período pedido")
+    return pa.Table.from_batches(lotes).select(COLUNAS_RESUMO)
+
+
+def classificar_celulas(celulas, resumo):
+    # Cada (linha, dia) do GPS recebe o cluster previsto para aquele dia;
+    # dias sem previsão ficam de fora, como no JOIN da consulta do mapa
+    classificacao = (
+        resumo.select(["linha", "data", "cluster_id"]).to_pandas()
+        .drop_duplicates(["linha", "data"])
+    )
+    celulas = celulas.assign(
+        linha=celulas["linha"].astype(str),
+        data=pd.to_datetime(celulas["data"]).dt.date,
+    )
+    classificacao["data"] = pd.to_datetime(classificacao["data"]).dt.date
+    juntas = celulas.merge(classificacao, on=["linha", "data"], how="inner")
+    return pa.Table.from_pandas(juntas[[
+        "linha", "data", "cluster_id", "celula_lat", "celula_lon", "pontos",
+    ]], preserve_index=False).cast(pa.schema([
+        ("linha", pa.string()),
+        ("data", pa.date32()),
+        ("cluster_id", TIPOS_LOTE["cluster_id"]),
+        ("celula_lat", pa.int32()),
+        ("celula_lon", pa.int32()),
+        ("pontos", pa.int64()),
+    ]))
+
+
+def mostrar_progresso(lidas, total):
+    if total:
+        print(f"\r    📥 {lidas:,} de {total:,} registros", end="", flush=True)
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Pré-calcula o artefato de previsões lido pelo painel")
+    parser.add_argument("--fonte", help="bigquery (padrão da config) ou local")
+    parser.add_argument("--credenciais", help="JSON da conta de serviço do GCP")
+    parser.add_argument("--desde", type=date.fromisoformat, help="primeiro dia (padrão: histórico inteiro)")
+    parser.add_argument("--ate", type=date.fromisoformat, help="último dia (padrão: o mais recente)")
+    parser.add_argument("--dias-gps", type=int,
+                        help="só os últimos N dias nas células do mapa (padrão: o período inteiro)")
+    parser.add_argument("--saida", default=artefato.DIRETORIO_PADRAO, help="pasta dos artefatos")
+    parser.add_argument("--manter", type=int, default=3, help="versões antigas mantidas")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    fonte = criar_fonte(args.fonte, credenciais_gcp(args.credenciais))
+    inicio = time.perf_counter()
+
+    print("⏱️  Resumo com previsões de cluster e PCA...", flush=True)
+    resumo = tabela_resumo(fonte, args.desde, args.ate)
+    print()
+
+    datas = pc.min_max(resumo["data"])
+    primeiro_dia, ultimo_dia = datas["min"].as_py(), datas["max"].as_py()
+    if args.dias_gps:
+        primeiro_dia = max(primeiro_dia, ultimo_dia - timedelta(days=args.dias_gps - 1))
+    print(f"⏱️  Células de GPS de {primeiro_dia} a {ultimo_dia}...", flush=True)
+    celulas = classificar_celulas(fonte.celulas_gps(primeiro_dia, ultimo_dia), resumo)
+
+    manifesto = artefato.gravar(resumo, celulas, args.saida, origem={
+        "fonte": args.fonte or config.obter("fonte", "bigquery"),
+        "desde": str(args.desde) if args.desde else None,
+        "ate": str(args.ate) if args.ate else None,
+        "dias_gps": args.dias_gps,
+        "duracao_s": round(time.perf_counter() - inicio, 3),
+    })
+    removidas = artefato.limpar_antigos(args.saida, args.manter)
+
+    for nome, tabela in manifesto["tabelas"].items():
+        print(
+            f"    {nome:<12} {tabela['linhas']:>12,} linhas  {tabela['primeiro_dia']} a {tabela['ultimo_dia']}  "
+            f"{tabela['bytes'] / 1024 ** 2:8.2f} MB  sha256 {tabela['sha256'][:12]}"
+        )
+    if removidas:
+        print(f"🧹 Versões antigas removidas: {', '.join(removidas)}")
+    print(f"📦 Artefato {manifesto['versao']} publicado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
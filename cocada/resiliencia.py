@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+
+from cocada import metricas
+
+
+# ======================================================================
+# PRAZOS, NOVAS TENTATIVAS E DISJUNTOR
+# ======================================================================
+# Cada consulta à fonte remota tem um prazo total, dividido entre as
+# tentativas (com espera exponencial e um pouco de aleatoriedade entre
+# elas): uma consulta lenta ou falhando nunca segura a página por mais do
+# que esse prazo. O disjuntor conta as consultas que falharam em seguida;
+# depois de `falhas_para_abrir` ele abre e as próximas falham na hora, sem
+# ir à fonte, até passar `espera_s`. Aí uma consulta de teste é liberada:
+# se der certo o circuito fecha, se falhar ele abre de novo. Quem chama
+# trata a falha servindo a última cópia boa (ver o painel).
+
+
+class PrazoEsgotado(TimeoutError):
+    pass
+
+
+class CircuitoAberto(Exception):
+    pass
+
+
+def com_tentativas(funcao, prazo_s, tentativas=3, transitorio=None, espera_base_s=0.5, nome="consulta"):
+    # funcao(restante_s): uma tentativa, que não deve passar do tempo restante.
+    # Só erros transitórios (transitorio(erro) verdadeiro) são tentados de novo
+    limite = time.monotonic() + prazo_s
+    for tentativa in range(1, tentativas + 1):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise PrazoEsgotado(f"{nome}: prazo de {prazo_s:.0f} s esgotado")
+        try:
+            return funcao(restante)
+        except Exception as erro:
+            metricas.contar("tentativas_falhas_total", consulta=nome, erro=type(erro).__name__)
+            espera = espera_base_s * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5)
+            ultima = tentativa == tentativas or time.monotonic() + espera >= limite
+            if ultima or (transitorio is not None and not transitorio(erro)):
+                raise
+        time.sleep(espera)
+
+
+class Disjuntor:
+    def __init__(self, nome, falhas_para_abrir=3, espera_s=60):
+        self.nome = nome
+        self.falhas_para_abrir = falhas_para_abrir
+        self.espera_s = espera_s
+
+        self.falhas = 0
+        self.aberto_em = None
+        self._em_teste = False
+        self._trava = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.aberto_em is None:
+            return "fechado"
+        if self._em_teste or time.monotonic() - self.aberto_em >= self.espera_s:
+            return "meio_aberto"
+        return "aberto"
+
+    def permitir(self):
+        # Antes de cada consulta: levanta CircuitoAberto sem ir à fonte
+        with self._trava:
+            if self.aberto_em is None:
+                return
+            restante = self.espera_s - (time.monotonic() - self.aberto_em)
+            if restante > 0 or self._em_teste:
+                metricas.contar("disjuntor_recusas_total", disjuntor=self.nome)
+                raise CircuitoAberto(
+                    f"{self.nome}: {self.falhas} falhas seguidas, nova tentativa em {max(restante, 0):.0f} s"
+                )
+            # Consulta de teste: só uma por vez enquanto o circuito está meio aberto
+            self._em_teste = True
+
+    def sucesso(self):
+        with self._trava:
+            fechou = self.aberto_em is not None
+            self.falhas = 0
+            self.aberto_em = None
+            self._em_teste = False
+        if fechou:
+            metricas.contar("disjuntor_transicoes_total", disjuntor=self.nome, estado="fechado")
+        metricas.definir("disjuntor_aberto", 0, disjuntor=self.nome)
+
+    def falha(self):
+        with self._trava:
+            self.falhas += 1
+            abriu = self._em_teste or (self.aberto_em is None and self.falhas >= self.falhas_para_abrir)
+            if abriu:
+                self.aberto_em = time.monotonic()
+            self._em_teste = False
+        if abriu:
+            metricas.contar("disjuntor_transicoes_total", disjuntor=self.nome, estado="aberto")
+            metricas.definir("disjuntor_aberto", 1, disjuntor=self.nome)
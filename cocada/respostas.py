@@ -0,0 +1,174 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from pathlib import Path
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# RESPOSTAS DO QUESTIONÁRIO (SQLITE, SÓ ANEXAÇÃO)
+# ======================================================================
+# Cada resposta é anexada à tabela `respostas` de um SQLite em modo WAL.
+# O envio do formulário só coloca a resposta numa fila: uma thread de
+# gravação junta o que chegou e grava em lotes, numa transação só, junto
+# com as contagens por valor (tabela `contagens`). Os números mostrados no
+# painel saem dessas contagens, mantidas também em memória, sem reler as
+# respostas.
+
+ARQUIVO_PADRAO = str(RAIZ_PROJETO / ".cache" / "respostas.sqlite")
+
+# Respostas gravadas por transação e espera máxima para juntar um lote
+TAMANHO_LOTE = 100
+ESPERA_LOTE_S = 0.5
+
+CAMPOS = ["timestamp", "pega_onibus", "linha_mais_pega", "chute_mais_atrasado"]
+# Campos com contagem incremental (linha mais usada e chutes)
+CONTADOS = ["linha_mais_pega", "chute_mais_atrasado"]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS respostas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    pega_onibus TEXT,
+    linha_mais_pega TEXT,
+    chute_mais_atrasado TEXT
+);
+CREATE TABLE IF NOT EXISTS contagens (
+    campo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (campo, valor)
+);
+"""
+
+
+def normalizar_linha(valor):
+    # " 321 " e "321" contam como a mesma linha; vazio não conta
+    valor = (valor or "").strip().upper()
+    return valor or None
+
+
+def _conectar(caminho):
+    conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.execute("PRAGMA synchronous=NORMAL")
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+
+class GravadorRespostas:
+    def __init__(self, caminho=None):
+        caminho = caminho or config.obter("arquivo_respostas", ARQUIVO_PADRAO)
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self.caminho = str(caminho)
+
+        self.fila = queue.Queue()
+        self._trava = threading.Lock()
+        self.contagens = {campo: Counter() for campo in CONTADOS}
+        self.total = 0
+        self._carregar_contagens()
+
+        self._thread = threading.Thread(target=self._gravar_continuamente, name="gravador-respostas", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def _carregar_contagens(self):
+        with closing(_conectar(self.caminho)) as conexao:
+            for campo, valor, quantidade in conexao.execute("SELECT campo, valor, quantidade FROM contagens"):
+                if campo in self.contagens:
+                    self.contagens[campo][valor] = quantidade
+            self.total = conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Envio (chamado pelo formulário, não espera o disco)
+    # ------------------------------------------------------------------
+
+    def registrar(self, resposta):
+        resposta = {campo: resposta.get(campo) for campo in CAMPOS}
+        with self._trava:
+            self.total += 1
+            for campo in CONTADOS:
+                valor = normalizar_linha(resposta[campo])
+                if valor is not None:
+                    self.contagens[campo][valor] += 1
+        self.fila.put(resposta)
+
+    # ------------------------------------------------------------------
+    # Thread de gravação
+    # ------------------------------------------------------------------
+
+    def _proximo_lote(self):
+        lote = [self.fila.get()]
+        while len(lote) < TAMANHO_LOTE:
+            try:
+                lote.append(self.fila.get(timeout=ESPERA_LOTE_S))
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar_continuamente(self):
+        conexao = _conectar(self.caminho)
+        while True:
+            lote = self._proximo_lote()
+            respostas = [resposta for resposta in lote if resposta is not None]
+            if respostas:
+                self._gravar(conexao, respostas)
+            for _ in lote:
+                self.fila.task_done()
+            if len(respostas) < len(lote):
+                # None na fila = pedido de encerramento
+                conexao.close()
+                return
+
+    def _gravar(self, conexao, respostas):
+        incrementos = Counter(
+            (campo, valor)
+            for resposta in respostas
+            for campo in CONTADOS
+            if (valor := normalizar_linha(resposta[campo])) is not None
+        )
+        with conexao:
+            conexao.executemany(
+                f"INSERT INTO respostas ({', '.join(CAMPOS)}) VALUES ({', '.join('?' * len(CAMPOS))})",
+                [[resposta[campo] for campo in CAMPOS] for resposta in respostas],
+            )
+            conexao.executemany(
+                """
+                INSERT INTO contagens (campo, valor, quantidade) VALUES (?, ?, ?)
+                ON CONFLICT (campo, valor) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+                """,
+                [(campo, valor, quantidade) for (campo, valor), quantidade in incrementos.items()],
+            )
+
+    def fechar(self):
+        # Grava o que ainda estiver na fila antes de o processo terminar
+        if self._thread.is_alive():
+            self.fila.put(None)
+            self._thread.join(timeout=10)
+
+    # ------------------------------------------------------------------
+    # Leitura das contagens
+    # ------------------------------------------------------------------
+
+    def resumo(self, linha_mais_atrasada):
+        correta = normalizar_linha(str(linha_mais_atrasada))
+        with self._trava:
+            linhas = self.contagens["linha_mais_pega"]
+            chutes = self.contagens["chute_mais_atrasado"]
+            total_chutes = sum(chutes.values())
+            acertos = chutes.get(correta, 0)
+            erros = [(valor, quantidade) for valor, quantidade in chutes.most_common() if valor != correta]
+
+            return {
+                "respostas": self.total,
+                "linha_mais_usada": linhas.most_common(1)[0] if linhas else None,
+                "chutes": total_chutes,
+                "acertos": acertos,
+                "proporcao_acertos": acertos / total_chutes if total_chutes else None,
+                "chute_errado_mais_comum": erros[0] if erros else None,
+            }
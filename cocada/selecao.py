@@ -0,0 +1,92 @@
+from cocada import metricas
+from cocada.esquema import pegada_memoria
+from cocada.memo import CacheLRU
+from cocada.versao import marcar_versao
+
+
+# ======================================================================
+# SELEÇÃO (PERÍODO × LINHAS) E CACHE DE SUPERCONJUNTOS
+# ======================================================================
+# Uma seleção é o que vai para o WHERE da consulta: período (inclusive) e
+# linhas; None = sem restrição. O cache guarda os resultados já carregados
+# e responde uma seleção mais estreita recortando localmente um resultado
+# que a contém, sem voltar à fonte. Só o que não está contido em nenhum
+# resultado guardado vira consulta nova.
+
+
+class Selecao:
+    def __init__(self, inicio=None, fim=None, linhas=None):
+        self.inicio = inicio
+        self.fim = fim
+        self.linhas = None if linhas is None else frozenset(str(linha) for linha in linhas)
+
+    def chave(self):
+        return (self.inicio, self.fim, self.linhas)
+
+    def __eq__(self, outra):
+        return isinstance(outra, Selecao) and self.chave() == outra.chave()
+
+    def __hash__(self):
+        return hash(self.chave())
+
+    def __repr__(self):
+        linhas = "todas" if self.linhas is None else f"{len(self.linhas)} linhas"
+        return f"Selecao({self.inicio} a {self.fim}, {linhas})"
+
+    def contem(self, outra):
+        inicio_ok = self.inicio is None or (outra.inicio is not None and outra.inicio >= self.inicio)
+        fim_ok = self.fim is None or (outra.fim is not None and outra.fim <= self.fim)
+        linhas_ok = self.linhas is None or (outra.linhas is not None and outra.linhas <= self.linhas)
+        return inicio_ok and fim_ok and linhas_ok
+
+
+def recortar(df, selecao):
+    # Mesmo filtro da consulta, aplicado a um DataFrame já normalizado
+    mascara = df["linha"].notna()
+    if selecao.inicio is not None:
+        mascara &= df["data"] >= selecao.inicio
+    if selecao.fim is not None:
+        mascara &= df["data"] <= selecao.fim
+    if selecao.linhas is not None:
+        mascara &= df["linha"].isin(selecao.linhas)
+
+    recorte = df[mascara].reset_index(drop=True)
+    if hasattr(recorte["linha"], "cat"):
+        # Só as linhas presentes, como num resultado lido direto da fonte
+        recorte["linha"] = recorte["linha"].cat.remove_unused_categories()
+    recorte.attrs = dict(df.attrs)
+    # Pegada antes da normalização: estimativa proporcional ao recorte
+    if "memoria_antes" in df.attrs and len(df):
+        recorte.attrs["memoria_antes"] = int(df.attrs["memoria_antes"] * len(recorte) / len(df))
+    recorte.attrs["memoria_depois"] = pegada_memoria(recorte)
+    return marcar_versao(recorte)
+
+
+class CacheSelecoes:
+    def __init__(self, limite_bytes):
+        self.lru = CacheLRU(limite_bytes)
+
+    def obter(self, selecao, carregar):
+        # carregar(selecao) -> DataFrame normalizado, lido com a seleção no WHERE
+        # A falta só conta se nem o recorte de um superconjunto servir
+        df = self.lru.obter(selecao, contar_falta=False)
+        if df is not None:
+            metricas.contar("cache_selecoes_total", resultado="exato")
+            return df
+
+        superconjunto, df = self.lru.procurar(lambda guardada: guardada.contem(selecao))
+        if df is not None:
+            metricas.contar("cache_selecoes_total", resultado="recorte")
+            with metricas.etapa("recorte_selecao"):
+                return self.lru.guardar(selecao, recortar(df, selecao))
+
+        metricas.contar("cache_selecoes_total", resultado="consulta")
+        return self.lru.guardar(selecao, carregar(selecao))
+
+    def substituir(self, selecao, df):
+        # Troca o resultado guardado por outro com o mesmo conteúdo (ex.: a
+        # versão mapeada em memória do modo compartilhado, ver o painel)
+        return self.lru.guardar(selecao, df)
+
+    def estatisticas(self):
+        return self.lru.estatisticas()
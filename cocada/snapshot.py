@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from cocada import config
+from cocada.config import RAIZ_PROJETO
+
+
+# ======================================================================
+# SNAPSHOT LOCAL DA TABELA RESUMO
+# ======================================================================
+# Cópia persistente em Parquet, particionada por `data` (data=AAAA-MM-DD/),
+# com um manifesto que guarda o intervalo de dias já baixado. Assim um
+# processo novo lê do disco e só busca no BigQuery os dias que faltam; o
+# intervalo coberto é sempre contínuo (do primeiro dia pedido até o mais
+# recente), então pedir um período mais antigo só baixa o trecho anterior.
+#
+# Mais de uma thread (página, pré-carga, atualização em segundo plano) e
+# mais de um processo podem usar o mesmo snapshot. Duas travas de arquivo
+# (flock, que vale entre processos e também entre threads, já que cada
+# open() tem a sua) organizam isso:
+#   - sincronização: quem vai buscar dias na fonte segura a trava durante a
+#     busca inteira; o próximo espera e, ao entrar, vê os dias já gravados
+#     em vez de baixá-los de novo (ver cocada.carga.sincronizar_snapshot);
+#   - publicação: a troca das pastas dos dias e do manifesto é exclusiva;
+#     as leituras seguram a mesma trava compartilhada, então nunca veem um
+#     dia pela metade ou uma partição sumindo no meio da leitura.
+
+DIRETORIO_PADRAO = config.obter("snapshot_dir", str(RAIZ_PROJETO / ".cache" / "snapshot_resumo"))
+
+# Sem fcntl (Windows) as duas travas viram uma trava do processo
+_TRAVA_PROCESSO = threading.RLock()
+
+
+@contextmanager
+def _travar(caminho, exclusiva=True):
+    try:
+        import fcntl
+    except ImportError:
+        with _TRAVA_PROCESSO:
+            yield
+        return
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "a") as arquivo:
+        # Fechar o arquivo solta a trava
+        fcntl.flock(arquivo, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        yield
+
+
+class SnapshotResumo:
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = Path(diretorio)
+        self.manifesto = self.diretorio / "_manifesto.json"
+
+    def existe(self):
+        return self.manifesto.exists()
+
+    # Arquivos começando com "_" ficam fora da leitura do Parquet
+    def sincronizacao(self):
+        return _travar(self.diretorio / "_trava_sincronizacao")
+
+    def _publicacao(self, exclusiva=True):
+        return _travar(self.diretorio / "_trava_publicacao", exclusiva)
+
+    def _ler_manifesto(self):
+        if not self.existe():
+            return {}
+        with open(self.manifesto) as f:
+            return json.load(f)
+
+    def ultima_data(self):
+        info = self._ler_manifesto()
+        return pd.Timestamp(info["ultima_data"]).date() if info else None
+
+    def primeira_data(self):
+        # Manifestos antigos não têm "primeira_data": vale a partição mais antiga
+        info = self._ler_manifesto()
+        if "primeira_data" in info:
+            return pd.Timestamp(info["primeira_data"]).date()
+        dias = self.dias()
+        return dias[0] if dias else None
+
+    def intervalos_faltantes(self, inicio=None, recentes=True):
+        # (desde, ate) a buscar na fonte para cobrir de `inicio` até hoje;
+        # ate=None = até o dia mais recente. O último dia salvo é sempre
+        # buscado de novo (pode ter chegado incompleto). recentes=False: só
+        # o trecho anterior ao snapshot, sem os dias novos.
+        if not self.existe():
+            return [(inicio, None)]
+        intervalos = []
+        primeira = self.primeira_data()
+        if inicio is not None and primeira is not None and inicio < primeira:
+            intervalos.append((inicio, primeira - timedelta(days=1)))
+        if recentes:
+            intervalos.append((self.ultima_data(), None))
+        return intervalos
+
+    def dias(self):
+        return sorted(
+            pd.Timestamp(pasta.name.split("=", 1)[1]).date()
+            for pasta in self.diretorio.glob("data=*")
+        )
+
+    def periodo(self):
+        if not self.existe():
+            return None, None
+        with self._publicacao(exclusiva=False):
+            dias = self.dias()
+        return (dias[0], dias[-1]) if dias else (None, None)
+
+    def ler(self, desde=None, ate=None, linhas=None):
+        if not self.existe():
+            return None
+        # Filtros sobre a partição data= descartam pastas inteiras sem abri-las;
+        # o de linhas é aplicado na leitura dos arquivos restantes
+        filtros = []
+        if desde is not None:
+            filtros.append(("data", ">=", str(desde)))
+        if ate is not None:
+            filtros.append(("data", "<=", str(ate)))
+        if linhas is not None:
+            filtros.append(("linha", "in", sorted(map(str, linhas))))
+        # Arquivos começando com "_" ou "." (manifesto, travas, temporários) são ignorados
+        with self._publicacao(exclusiva=False):
+            df = pd.read_parquet(self.diretorio, filters=filtros or None)
+        df["data"] = pd.to_datetime(df["data"].astype(str))
+        return df.sort_values(["data", "linha"], ignore_index=True)
+
+    def anexar(self, df_novo, desde=None):
+        if df_novo is None or df_novo.empty:
+            return
+        self.anexar_lotes([pa.RecordBatch.from_pandas(df_novo, preserve_index=False)], desde)
+
+    def anexar_lotes(self, lotes, desde=None):
+        # `desde`: primeiro dia pedido à fonte, mesmo que ele não tenha dados
+        # Cada lote é dividido por dia e gravado direto em disco; nenhum
+        # momento exige o resultado inteiro em memória
+        preparacao = self.diretorio / f".tmp-{uuid.uuid4().hex}"
+        dias = set()
+
+        for numero, lote in enumerate(lotes):
+            if lote.num_rows == 0:
+                continue
+            tabela = pa.Table.from_batches([lote])
+            datas = pc.cast(pc.cast(tabela["data"], pa.date32()), pa.string())
+            for dia in pc.unique(datas).to_pylist():
+                pasta = preparacao / f"data={dia}"
+                pasta.mkdir(parents=True, exist_ok=True)
+                parte = tabela.filter(pc.equal(datas, dia)).drop_columns(["data"])
+                pq.write_table(parte, pasta / f"parte-{numero}.parquet")
+                dias.add(dia)
+
+        with self._publicacao():
+            self._publicar(preparacao, dias, desde)
+        shutil.rmtree(preparacao, ignore_errors=True)
+
+    def _publicar(self, preparacao, dias, desde):
+        # Com a trava de publicação exclusiva: nenhuma leitura em andamento
+        if not dias:
+            if desde is not None and self.existe():
+                # Trecho vazio: fica marcado como coberto para não ser pedido de novo
+                desde = pd.Timestamp(desde).date()
+                self._gravar_manifesto(self.ultima_data(), min(desde, self.primeira_data() or desde))
+            return
+
+        # Cada dia é regravado inteiro: o último dia do snapshot pode ter
+        # chegado incompleto e é buscado de novo no refresh seguinte.
+        for dia in sorted(dias):
+            destino = self.diretorio / f"data={dia}"
+            if destino.exists():
+                shutil.rmtree(destino)
+            os.replace(preparacao / f"data={dia}", destino)
+
+        ultima = pd.Timestamp(max(dias)).date()
+        anterior = self.ultima_data()
+        if anterior is not None and anterior > ultima:
+            ultima = anterior
+        primeira = [pd.Timestamp(min(dias)).date()]
+        for outra in (desde, self.primeira_data()):
+            if outra is not None:
+                primeira.append(pd.Timestamp(outra).date())
+        self._gravar_manifesto(ultima, min(primeira))
+
+    def _gravar_manifesto(self, ultima, primeira):
+        temporario = self.manifesto.with_suffix(".tmp")
+        with open(temporario, "w") as f:
+            json.dump({"primeira_data": primeira.isoformat(), "ultima_data": ultima.isoformat()}, f)
+        os.replace(temporario, self.manifesto)
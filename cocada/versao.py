@@ -0,0 +1,29 @@
+import hashlib
+
+import pandas as pd
+
+
+# ======================================================================
+# VERSÃO DOS DADOS
+# ======================================================================
+# Identificador curto do conteúdo carregado. É calculado uma vez no
+# carregamento e guardado em df.attrs["versao"], para que os caches que
+# dependem dos dados (agregados, filtros, figuras) usem a versão como chave
+# em vez de fazer hash do DataFrame inteiro a cada rerun.
+
+
+def calcular_versao(df):
+    # Hash de cada linha (todas as colunas, inclusive categorias e textos)
+    # e, sobre eles, um hash só: qualquer valor trocado muda a versão
+    resumo = hashlib.sha1("|".join(f"{coluna}:{tipo}" for coluna, tipo in df.dtypes.items()).encode())
+    resumo.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return resumo.hexdigest()[:12]
+
+
+def marcar_versao(df):
+    df.attrs["versao"] = calcular_versao(df)
+    return df
+
+
+def versao_de(df):
+    return df.attrs.get("versao") or calcular_versao(df)
@@ -1,16 +1,21 @@
+import html
+import time
+
+INICIO_SCRIPT = time.perf_counter()
+
 import streamlit as st
-import basedosdados as bd
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 import os
 import json
 import tempfile
-from google.oauth2 import service_account
-from google.cloud import bigquery
+import atexit
+import uuid
+
+# Só o que a tela do questionário usa. pandas, pyarrow, Plotly e as fontes
+# de dados são importados depois do questionário (ver "IMPORTAÇÕES DOS
+# DADOS"), então a primeira tela não espera por eles.
+from cocada import config, metricas
+from cocada.respostas import GravadorRespostas
 
 
 st.set_page_config(
@@ -20,20 +25,398 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 # Configuração de Credenciais do GCP
-if "gcp_service_account" in st.secrets:
+def credenciais_gcp():
+    # Sem secrets.toml (ex.: fonte local, máquina sem rede) não há credenciais
+    if st.secrets.load_if_toml_exists() and "gcp_service_account" in st.secrets:
+        return dict(st.secrets["gcp_service_account"])
+    return None
+
+
+@st.cache_resource
+def configurar_credenciais():
+    # Roda uma vez por processo (e não a cada rerun): grava o JSON da conta de
+    # serviço num único arquivo, usado pelas bibliotecas do Google que procuram
+    # GOOGLE_APPLICATION_CREDENTIALS, e o apaga quando o processo termina.
+    service_account_info = credenciais_gcp()
+    if service_account_info is None:
+        return None
+
+    descritor, caminho = tempfile.mkstemp(prefix="cocada-gcp-", suffix=".json")
+    with os.fdopen(descritor, "w") as temp:
+        json.dump(service_account_info, temp)
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = caminho
+
+    def apagar_arquivo():
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    atexit.register(apagar_arquivo)
+
+    return service_account_info
+
+
+@st.cache_resource(show_spinner=False)
+def fonte_dados():
+    # Uma fonte (e um cliente do BigQuery) por processo, compartilhada pelos loaders
+    from cocada.fontes import criar_fonte
+
+    return criar_fonte(credenciais=configurar_credenciais())
+
+
+@st.cache_resource(show_spinner=False)
+def gravador_respostas():
+    # Uma thread de gravação por processo, compartilhada pelas sessões
+    return GravadorRespostas()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def fonte_da_versao(versao_dados):
+    # A fonte de cada versão dos dados: a mesma do processo, exceto quando
+    # ela está presa a uma versão (artefato), que é reaberta na atualização
+    return fonte_dados().atualizada()
+
+
+# ======================================================================
+# LOADERS EM CACHE
+# ======================================================================
+# Definidos antes do questionário porque a pré-carga chama estes mesmos
+# loaders numa thread do pool assim que a sessão abre. A leitura em si
+# fica em cocada.carga, importada só dentro deles: a tela do questionário
+# continua sem pandas, pyarrow e Plotly no caminho. Chamados pela pré-carga
+# ou pela atualização (_interface=False) eles não criam elementos na
+# página, que não tem script rodando para recebê-los. O primeiro argumento
+# é a versão dos dados (ver ATUALIZAÇÃO EM SEGUNDO PLANO): cada versão tem
+# as suas entradas nos caches.
+
+
+def fonte_ou_snapshot(versao_dados):
+    # None quando a fonte não pode ser criada mas há um snapshot salvo em
+    # disco (ex.: sem credenciais): a carga serve o snapshot
+    from cocada.fontes import FonteIndisponivel
+    from cocada.snapshot import SnapshotResumo
+
     try:
-        # Cria as credenciais a partir do dicionário de secrets
-        service_account_info = st.secrets["gcp_service_account"]
-        
-        # Cria um arquivo temporário para salvar as credenciais (necessário para o basedosdados)
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".json") as temp:
-            json.dump(dict(service_account_info), temp)
-            temp.flush()
-            # Define a variável de ambiente que o basedosdados/bigquery procuram
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp.name
-            
-    except Exception as e:
-        st.error(f"Erro na configuração de credenciais: {e}")
+        return fonte_da_versao(versao_dados)
+    except FonteIndisponivel:
+        if SnapshotResumo().existe():
+            return None
+        raise
+
+
+def parar_com_erro(erro):
+    st.error(str(erro))
+    st.stop()
+
+
+def erro_de_consulta(erro):
+    # Fonte fora do ar (prazo, falhas seguidas, circuito aberto): não para a
+    # página, sobe para quem pode servir a última cópia boa (com_reserva)
+    from cocada.fontes import ConsultaFalhou
+
+    return isinstance(erro, ConsultaFalhou)
+
+
+def progresso_em(barra):
+    # Progresso da ingestão em lotes (só aparece quando há download do BigQuery)
+    def mostrar_progresso(lidas, total):
+        if total:
+            barra.progress(min(lidas / total, 1.0), text=f"📥 {lidas:,} de {total:,} registros recebidos")
+    return mostrar_progresso
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cache_selecoes(versao_dados):
+    # Resultados já carregados, compartilhados entre sessões: um período
+    # contido num período já carregado é recortado localmente, sem consulta.
+    # Um cache por versão dos dados (a atual e a anterior, durante a troca).
+    # Orçamento de memória na config "cache_selecoes_mb"
+    from cocada.selecao import CacheSelecoes
+
+    return CacheSelecoes(limite_bytes=int(config.obter("cache_selecoes_mb", 512)) * 1024 ** 2)
+
+
+def carregar_selecao(versao_dados, inicio, fim, interface=True):
+    from cocada import carga
+    from cocada.fontes import FonteIndisponivel
+    from cocada.selecao import Selecao
+
+    barra = st.empty() if interface else None
+    # Com a atualização em segundo plano ligada, os dias novos chegam por
+    # ela; a carga só baixa o que o snapshot ainda não cobre
+    novos_dias = not atualizador().ativa
+    try:
+        fonte = fonte_ou_snapshot(versao_dados)
+        df = cache_selecoes(versao_dados).obter(
+            Selecao(inicio, fim),
+            lambda selecao: carga.ler_resumo(
+                fonte, selecao, progresso_em(barra) if barra else None, novos_dias=novos_dias,
+            ),
+        )
+    except FonteIndisponivel as e:
+        if barra:
+            barra.empty()
+        if not interface or erro_de_consulta(e):
+            raise
+        parar_com_erro(e)
+    if barra:
+        barra.empty()
+    return df
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def carregar_dados(versao_dados, inicio, fim, _interface=True):
+    metricas.registrar_falta("carregar_dados")
+    return carregar_selecao(versao_dados, inicio, fim, _interface)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def carregar_dados_compartilhados(versao_dados, inicio, fim, _interface=True):
+    # Config "compartilhar_memoria": em vez de uma cópia por sessão, um único
+    # DataFrame por processo, apoiado num arquivo Arrow mapeado em memória que
+    # também é compartilhado com os outros processos da máquina
+    from cocada import compartilhado
+    from cocada.selecao import Selecao
+    from cocada.versao import versao_de
+
+    metricas.registrar_falta("carregar_dados_compartilhados")
+    df = carregar_selecao(versao_dados, inicio, fim, _interface)
+    versao = versao_de(df)
+    caminho = compartilhado.publicar(df, versao)
+    compartilhado.limpar_versoes_antigas()
+    aberto = compartilhado.abrir(caminho)
+    # O cache de seleções fica com o DataFrame mapeado no lugar da cópia
+    # carregada: períodos menores continuam sendo recortados dele, sem uma
+    # segunda cópia do período no processo
+    cache_selecoes(versao_dados).substituir(Selecao(inicio, fim), aberto)
+    return aberto
+
+
+def carregar_resumo(versao_dados, inicio, fim, interface=True):
+    atualizador().registrar("resumo", inicio, fim)
+    if config.obter_bool("compartilhar_memoria"):
+        return carregar_dados_compartilhados(versao_dados, inicio, fim, interface)
+    return carregar_dados(versao_dados, inicio, fim, interface)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def periodo_disponivel(versao_dados, _interface=True):
+    # Primeiro e último dia com dados: limites do seletor de período
+    from cocada import carga
+    from cocada.fontes import FonteIndisponivel
+
+    try:
+        primeiro, ultimo = carga.periodo_disponivel(fonte_ou_snapshot(versao_dados))
+    except FonteIndisponivel as e:
+        if not _interface or erro_de_consulta(e):
+            raise
+        parar_com_erro(e)
+    return primeiro, ultimo
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def carregar_mapa_versao(versao_dados, inicio, fim):
+    # Sem fonte configurada não há mapa (o snapshot só tem o resumo)
+    from cocada import carga
+
+    metricas.registrar_falta("carregar_mapa")
+    df = carga.ler_mapa(fonte_da_versao(versao_dados), inicio, fim)
+    mapas_carregados().guardar((inicio, fim), df)
+    return df
+
+
+def carregar_mapa(versao_dados, inicio, fim):
+    atualizador().registrar("mapa", inicio, fim)
+    return carregar_mapa_versao(versao_dados, inicio, fim)
+
+
+# ======================================================================
+# RESERVA (FONTE FORA DO AR)
+# ======================================================================
+# Quando a fonte não responde dentro do prazo, falha depois das novas
+# tentativas ou está com o circuito aberto (ver cocada.resiliencia), a
+# página não espera nem para: serve a última cópia boa, marcada como
+# desatualizada. O resumo vem do snapshot em disco; o mapa, do último
+# resultado carregado para o mesmo período. Nada disso entra nos caches da
+# versão, então a execução seguinte volta a tentar a fonte (na hora, se o
+# circuito já estiver liberando consultas).
+
+
+@st.cache_resource(show_spinner=False)
+def mapas_carregados():
+    # Últimos mapas carregados com sucesso, por período; config "cache_reserva_mb"
+    from cocada.memo import CacheLRU
+
+    return CacheLRU(limite_bytes=int(config.obter("cache_reserva_mb", 64)) * 1024 ** 2)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def carregar_reserva(manifesto_snapshot, inicio, fim):
+    # manifesto_snapshot: data de modificação do manifesto, para reler o
+    # snapshot quando a atualização gravar dias novos nele
+    from cocada import carga
+    from cocada.selecao import Selecao
+
+    return carga.ler_reserva(Selecao(inicio, fim))
+
+
+def reserva_resumo(inicio, fim):
+    from cocada.snapshot import SnapshotResumo
+
+    snapshot = SnapshotResumo()
+    if not snapshot.existe():
+        return None
+    return carregar_reserva(snapshot.manifesto.stat().st_mtime_ns, inicio, fim)
+
+
+def reserva_periodo():
+    from cocada import carga
+
+    primeiro, ultimo = carga.periodo_disponivel(None)
+    return None if primeiro is None else (primeiro, ultimo)
+
+
+def com_reserva(nome, carregar, reserva, parar=True, avisar=True):
+    # Sem cópia boa: para a página com o erro (parar) ou deixa o erro subir
+    try:
+        return carregar()
+    except Exception as erro:
+        if not erro_de_consulta(erro):
+            raise
+        resultado = reserva()
+        if resultado is None:
+            if not parar:
+                raise
+            parar_com_erro(erro)
+        metricas.contar("reserva_total", loader=nome)
+        if not avisar:
+            return resultado
+        ultimo_dia = getattr(resultado, "attrs", {}).get("desatualizado")
+        ate = f" (dados até {ultimo_dia:%d/%m/%Y})" if ultimo_dia else ""
+        st.warning(
+            f"⚠️ {erro}. Mostrando a última cópia salva{ate}, que pode estar desatualizada; "
+            "os dados voltam a ser atualizados assim que a fonte responder."
+        )
+        return resultado
+
+
+# ======================================================================
+# ATUALIZAÇÃO EM SEGUNDO PLANO
+# ======================================================================
+# A cada "atualizacao_min" minutos (0 desliga) uma thread busca os dias
+# novos, carrega uma versão nova dos dados nos loaders acima (o período
+# padrão, o mapa do dia padrão e os pedidos recentes das sessões) e só
+# então troca a versão atual: as sessões nunca esperam pela atualização,
+# e recebem a versão anterior até a troca. Com fonte remota e um snapshot
+# em disco a primeira atualização roda logo ao iniciar, enquanto o
+# snapshot é servido.
+
+
+def aquecer_versao(versao_dados, pedidos):
+    from cocada import carga
+
+    carga.atualizar_snapshot(fonte_ou_snapshot(versao_dados))
+    primeiro, ultimo = periodo_disponivel(versao_dados, _interface=False)
+    inicio, fim = carga.periodo_padrao(primeiro, ultimo, config.obter("dias_periodo_padrao"))
+    dia_mapa = carga.dia_mapa_padrao(inicio, fim)
+
+    for nome, *args in [("resumo", inicio, fim), ("mapa", dia_mapa, dia_mapa), *pedidos]:
+        if nome == "resumo":
+            carregar_resumo(versao_dados, *args, False)
+        else:
+            carregar_mapa(versao_dados, *args)
+
+
+@st.cache_resource(show_spinner=False)
+def atualizador():
+    # Uma thread por processo. Sem fonte (só o snapshot em disco) não há de
+    # onde atualizar e a versão fica fixa. A atualização imediata só vale
+    # com um snapshot já em disco: sem ele a primeira carga da página (ou a
+    # pré-carga) já busca tudo, e a atualização só repetiria o trabalho
+    from cocada.atualizacao import Atualizador
+    from cocada.fontes import FonteIndisponivel
+    from cocada.snapshot import SnapshotResumo
+
+    try:
+        remota = fonte_dados().remota
+    except FonteIndisponivel:
+        return Atualizador(aquecer_versao, 0)
+    intervalo_s = float(config.obter("atualizacao_min", 60)) * 60
+    imediata = remota and SnapshotResumo().existe()
+    return Atualizador(aquecer_versao, intervalo_s, imediata=imediata).iniciar()
+
+
+# ======================================================================
+# PRÉ-CARGA (ENQUANTO O QUESTIONÁRIO ESTÁ ABERTO)
+# ======================================================================
+# Assim que o questionário aparece, uma thread do pool descobre o período
+# padrão e dispara o resumo e o mapa ao mesmo tempo, pelos loaders acima.
+# A página de resultados pega os futuros prontos (ou ainda em andamento)
+# em vez de começar as consultas depois do envio, uma atrás da outra. Se a
+# pré-carga falhar, o loader é chamado de novo na página e mostra o erro.
+
+
+@st.cache_resource(show_spinner=False)
+def pool_precarga():
+    # Compartilhado pelas sessões; config "threads_precarga"
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(
+        max_workers=int(config.obter("threads_precarga", 4)), thread_name_prefix="precarga"
+    )
+
+
+def antecipar_carga():
+    from cocada import carga
+
+    versao_dados = atualizador().versao
+    primeiro, ultimo = periodo_disponivel(versao_dados, _interface=False)
+    inicio, fim = carga.periodo_padrao(primeiro, ultimo, config.obter("dias_periodo_padrao"))
+    dia_mapa = carga.dia_mapa_padrao(inicio, fim)
+
+    pool = pool_precarga()
+    return {
+        ("resumo", versao_dados, inicio, fim): pool.submit(carregar_resumo, versao_dados, inicio, fim, False),
+        ("mapa", versao_dados, dia_mapa, dia_mapa): pool.submit(carregar_mapa, versao_dados, dia_mapa, dia_mapa),
+    }
+
+
+def carregar_antecipado(nome, carregar, *args):
+    # Usa (e descarta) o futuro da pré-carga quando ela pediu exatamente
+    # isto; nas execuções seguintes o loader responde do cache
+    futuros = {}
+    precarga = st.session_state.get("precarga")
+    if precarga is not None:
+        try:
+            futuros = precarga.result()
+        except Exception:
+            pass
+    futuro = futuros.pop((nome, *args), None)
+
+    # Os outros futuros deste loader não servem mais (o período mudou ou a
+    # atualização trocou a versão dos dados): os que ainda estão na fila são
+    # cancelados e liberam o pool; os que já começaram terminam enchendo o
+    # cache da sua chave, mas a sessão não espera nem guarda o resultado
+    for chave in [chave for chave in futuros if chave[0] == nome]:
+        cancelado = futuros.pop(chave).cancel()
+        metricas.contar("precarga_total", loader=nome, resultado="cancelada" if cancelado else "descartada")
+
+    if futuro is not None:
+        situacao = "pronta" if futuro.done() else "em_andamento"
+        try:
+            with metricas.etapa("precarga_espera", loader=nome):
+                resultado = futuro.result()
+        except Exception:
+            metricas.contar("precarga_total", loader=nome, resultado="falhou")
+        else:
+            metricas.contar("precarga_total", loader=nome, resultado=situacao)
+            return resultado
+    return carregar(*args)
+
+
+try:
+    configurar_credenciais()
+except Exception as e:
+    st.error(f"Erro na configuração de credenciais: {e}")
 
 st.markdown("""
 <style>
@@ -151,10 +534,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Configurações do BigQuery
-BILLING_PROJECT_ID = "profound-portal-480504-a2"
-DATASET_ID = "analise_cocada"
-
 # Iniciar Aplicação com Questionário
 if 'questionario_completo' not in st.session_state:
     st.session_state.questionario_completo = False
@@ -253,73 +632,84 @@ if not st.session_state.questionario_completo:
                 if "respostas" not in st.session_state:
                     st.session_state.respostas = []
                
-                st.session_state.respostas.append({
+                resposta = {
                     "timestamp": datetime.now().isoformat(),
                     "pega_onibus": pega_onibus,
                     "linha_mais_pega": linha_mais_pega,
                     "chute_mais_atrasado": chute_mais_atrasado
-                })
+                }
+                st.session_state.respostas.append(resposta)
+                # Cópia durável: vai para a fila do gravador, sem esperar o disco
+                gravador_respostas().registrar(resposta)
             except Exception:
                 pass
            
             st.rerun()
-   
-    st.stop()
-
 
-
-# Funcão para carregar dados do BigQuery
+    # Primeira pintura: tempo do início do script até o questionário estar montado
+    metricas.observar("primeira_pintura_segundos", time.perf_counter() - INICIO_SCRIPT, pagina="questionario")
+    # Com o questionário já na tela, a carga dos dados começa em segundo plano
+    if "precarga" not in st.session_state:
+        st.session_state.precarga = pool_precarga().submit(antecipar_carga)
+    st.stop()
 
 
+# Tempos das etapas desta execução (painel de depuração e arquivo de métricas)
+if "id_sessao" not in st.session_state:
+    st.session_state.id_sessao = uuid.uuid4().hex[:8]
+execucao = metricas.iniciar_execucao("script", sessao=st.session_state.id_sessao)
 
-@st.cache_data(show_spinner=True)
-def carregar_dados():
-    # 1. Pegar credenciais direto dos Secrets (sem criar arquivo temporário)
-    if "gcp_service_account" not in st.secrets:
-        st.error("Secrets não encontradas.")
-        st.stop()
-        
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
-    )
-    
-    # 2. Criar o cliente oficial do BigQuery
-    client = bigquery.Client(credentials=creds, project=BILLING_PROJECT_ID)
-
-    # 3. A Query (Mesma de antes)
-    query = f"""
-    WITH dados_kmeans AS (
-        SELECT * FROM ML.PREDICT(MODEL `{BILLING_PROJECT_ID}.{DATASET_ID}.modelo_kmeans`, 
-            (SELECT * FROM `{BILLING_PROJECT_ID}.{DATASET_ID}.tabela_resumo` WHERE tempo_total_fundao IS NOT NULL))
-    ),
-    dados_pca AS (
-        SELECT * FROM ML.PREDICT(MODEL `{BILLING_PROJECT_ID}.{DATASET_ID}.modelo_pca`, 
-            (SELECT * FROM `{BILLING_PROJECT_ID}.{DATASET_ID}.tabela_resumo` WHERE tempo_total_fundao IS NOT NULL))
-    )
-    SELECT 
-        k.linha,
-        k.data,
-        k.tempo_total_fundao,
-        k.prop_atrasadas,
-        k.velocidade_media_fundao,
-        CAST(k.centroid_id AS STRING) as cluster_id,
-        p.principal_component_1 as pc1,
-        p.principal_component_2 as pc2
-    FROM dados_kmeans k
-    JOIN dados_pca p
-      ON k.linha = p.linha AND k.data = p.data
-    """
-    
-    # 4. Executar e converter para Pandas (Bem mais rápido)
-    job = client.query(query)
-    df = job.to_dataframe(create_bqstorage_client=False)
-    
-    return df
 
-
-with st.spinner("🔄 Carregando dados do BigQuery..."):
-    df = carregar_dados()
-    st.success(f"✅ {len(df):,} registros carregados do BigQuery!")
+# ======================================================================
+# IMPORTAÇÕES DOS DADOS
+# ======================================================================
+# Bibliotecas pesadas só a partir daqui, depois do questionário. O tempo
+# de cada uma aparece nas métricas (etapa "importacao") e no relatório de
+# partida (python -m benchmarks.partida).
+
+with metricas.etapa("importacao", modulo="pandas"):
+    import pandas as pd
+with metricas.etapa("importacao", modulo="cocada.carga"):
+    from cocada import carga
+with metricas.etapa("importacao", modulo="cocada.graficos"):
+    from cocada.graficos import figura_box, figura_causa_efeito, figura_mapa, figura_pca, modo_renderizacao
+with metricas.etapa("importacao", modulo="cocada"):
+    from cocada.agregados import MOTOR_PADRAO, CuboAgregados
+    from cocada.mapa import FATORES_ZOOM, ZOOM_PADRAO, celulas_para_zoom
+    from cocada.memo import CacheLRU, tamanho_em_bytes
+    from cocada.versao import versao_de
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cubo_agregados(versao, motor, _df):
+    # Compartilhado entre reruns e sessões; só é refeito quando os dados mudam.
+    # motor (config "motor_agregados"): "pandas" ou "duckdb", com o tempo de
+    # cada um na etapa "agregados_cubo" para comparar os dois
+    metricas.registrar_falta("cubo_agregados")
+    with metricas.etapa("agregados_cubo", motor=motor):
+        return CuboAgregados(_df, motor)
+
+
+@st.cache_resource
+def cache_filtros():
+    # Seleções populares ("todas as linhas", 321 × 945...) são reaproveitadas
+    # entre sessões; o orçamento de memória vem da config "cache_filtros_mb"
+    return CacheLRU(limite_bytes=int(config.obter("cache_filtros_mb", 256)) * 1024 ** 2)
+
+
+def visao_filtrada(df, cubo, linha_sel):
+    # As linhas são recortadas do período já carregado (que traz todas as
+    # linhas, usadas pelo cubo, pelo pódio e pelo chute): mexer no filtro
+    # não gera consulta nova
+    chave = (versao_de(df), frozenset(linha_sel))
+    with metricas.etapa("filtro"):
+        return cache_filtros().obter_ou_calcular(chave, lambda: {
+            "df_filtrado": df[df["linha"].isin(linha_sel)],
+            "resumo_selecao": cubo.resumo_selecao(linha_sel),
+            "ordem": cubo.ordem_por_mediana(linha_sel),
+            "comparacao": cubo.comparacao(linha_sel),
+            "caixas": cubo.caixas(linha_sel),
+        })
 
 
 # Sidebar
@@ -344,22 +734,71 @@ st.sidebar.markdown("---")
 st.sidebar.header("⚙️ Filtros de Análise")
 
 
-linhas = sorted(df["linha"].unique())
-linha_sel = st.sidebar.multiselect(
-    "📍 Selecione as linhas:",
-    linhas,
-    default=linhas,
-    help="Escolha uma ou mais linhas para análise detalhada"
+# Período analisado: vai para a consulta. Por padrão o histórico inteiro,
+# ou só os últimos N dias com a config "dias_periodo_padrao" (o mesmo que
+# a pré-carga pediu)
+
+# Versão dos dados desta execução: todos os loaders abaixo a recebem, então
+# uma troca no meio da execução só vale a partir da próxima
+versao_dados = atualizador().versao
+# (limites do seletor vindos do snapshot não pedem aviso: o do resumo basta)
+primeiro_dia, ultimo_dia = com_reserva(
+    "periodo_disponivel", lambda: periodo_disponivel(versao_dados), reserva_periodo, avisar=False,
+)
+inicio_padrao, _ = carga.periodo_padrao(primeiro_dia, ultimo_dia, config.obter("dias_periodo_padrao"))
+
+periodo = st.sidebar.date_input(
+    "📅 Período:",
+    value=(inicio_padrao, ultimo_dia),
+    min_value=primeiro_dia,
+    max_value=ultimo_dia,
+    format="DD/MM/YYYY",
+    help="Só os dias escolhidos são consultados"
 )
+# Enquanto o fim do intervalo não é escolhido, vale até o último dia; com
+# o campo apagado, vale o período padrão
+if len(periodo) == 2:
+    inicio, fim = periodo
+elif len(periodo) == 1:
+    inicio, fim = periodo[0], ultimo_dia
+else:
+    inicio, fim = inicio_padrao, ultimo_dia
+
+
+with st.spinner("🔄 Carregando dados do BigQuery..."):
+    loader = "carregar_dados_compartilhados" if config.obter_bool("compartilhar_memoria") else "carregar_dados"
+    df = com_reserva(
+        "resumo",
+        lambda: metricas.chamar_loader(loader, carregar_antecipado, "resumo", carregar_resumo, versao_dados, inicio, fim),
+        lambda: reserva_resumo(inicio, fim),
+    )
+
+# Com a atualização em segundo plano falhando a versão servida é a última
+# boa, que vai ficando para trás: o aviso marca os dados como desatualizados
+estado_atualizacao = atualizador()
+if estado_atualizacao.ultimo_erro and "desatualizado" not in df.attrs:
+    st.warning(
+        f"⚠️ Não foi possível atualizar os dados ({estado_atualizacao.ultimo_erro}). "
+        f"Mostrando a versão carregada em {estado_atualizacao.atualizada_em:%d/%m/%Y %H:%M}, "
+        "que pode estar desatualizada."
+    )
 
+if df.empty:
+    st.warning(f"Nenhum registro entre {inicio:%d/%m/%Y} e {fim:%d/%m/%Y}. Escolha outro período.")
+    execucao.finalizar()
+    st.stop()
+
+st.success(
+    f"✅ {len(df):,} registros carregados do BigQuery ({inicio:%d/%m/%Y} a {fim:%d/%m/%Y})! "
+    f"({df.attrs['memoria_antes'] / 1024 ** 2:.2f} MB → {df.attrs['memoria_depois'] / 1024 ** 2:.2f} MB em memória)"
+)
 
-df_filtrado = df[df["linha"].isin(linha_sel)]
+cubo = metricas.chamar_loader("cubo_agregados", cubo_agregados, versao_de(df), MOTOR_PADRAO, df)
 
 
 # Chute da linha
 
-linha_mais_atrasada = df.groupby("linha")["prop_atrasadas"].mean().idxmax()
-percentual_pior = df.groupby("linha")["prop_atrasadas"].mean().max() * 100
+linha_mais_atrasada, percentual_pior = cubo.linha_mais_atrasada()
 
 
 if st.session_state.chute_mais_atrasado:
@@ -373,68 +812,112 @@ if st.session_state.chute_mais_atrasado:
     else:
         st.markdown(f"""
             <div class='info-box' style='text-align: center; font-size: 1.1em;'>
-                🤔 Você chutou a linha <strong>{st.session_state.chute_mais_atrasado}</strong>,
+                🤔 Você chutou a linha <strong>{html.escape(st.session_state.chute_mais_atrasado)}</strong>,
                 mas a mais atrasada é a <strong>{linha_mais_atrasada}</strong> com {percentual_pior:.1f}% de atrasos.
                 Veja os dados abaixo!
             </div>
         """, unsafe_allow_html=True)
 
 
-# Cards de Métricas Principais
+# O que os participantes responderam até agora (contagens incrementais,
+# ver cocada.respostas)
 
-col1, col2, col3 = st.columns(3)
+participantes = gravador_respostas().resumo(linha_mais_atrasada)
 
 
-with col1:
+if participantes["respostas"]:
+    linha_mais_usada = participantes["linha_mais_usada"]
+    chute_errado = participantes["chute_errado_mais_comum"]
+    proporcao_acertos = participantes["proporcao_acertos"]
+    # Texto digitado por outros participantes: escapado antes de ir para o HTML
     st.markdown(f"""
-    <div class="metric-card">
-    <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
-        {df_filtrado['tempo_total_fundao'].median():.1f} min
-    </div>
-    <div style="font-size: 1rem; opacity: 0.85;">
-        Mediana de tempo no Fundão
-    </div>
-</div>
-""", unsafe_allow_html=True)
+        <div class='info-box' style='text-align: center;'>
+            👥 <strong>{participantes['respostas']:,}</strong> respostas até agora ·
+            🚌 Linha mais usada: <strong>{html.escape(linha_mais_usada[0]) if linha_mais_usada else "—"}</strong> ·
+            🎯 Acertaram o chute: <strong>{f"{proporcao_acertos * 100:.0f}%" if proporcao_acertos is not None else "—"}</strong> ·
+            🤔 Chute errado mais comum: <strong>{html.escape(chute_errado[0]) if chute_errado else "—"}</strong>
+        </div>
+    """, unsafe_allow_html=True)
 
 
-with col2:
-    st.markdown(f"""
-    <div class="metric-card">
-    <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
-        {df_filtrado['prop_atrasadas'].mean()*100:.1f}%
-    </div>
-    <div style="font-size: 1rem; opacity: 0.85;">
-        Atraso médio das viagens
+# Cards de Métricas Principais
+
+def mostrar_cards(resumo_selecao):
+    col1, col2, col3 = st.columns(3)
+
+
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+        <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
+            {resumo_selecao['mediana_tempo']:.1f} min
+        </div>
+        <div style="font-size: 1rem; opacity: 0.85;">
+            Mediana de tempo no Fundão
+        </div>
     </div>
-</div>
     """, unsafe_allow_html=True)
 
 
-with col3:
-    st.markdown(f"""
-    <div class="metric-card">
-    <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
-        {df_filtrado['cluster_id'].nunique()}
-    </div>
-    <div style="font-size: 1rem; opacity: 0.85;">
-        Clusters identificados
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+        <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
+            {resumo_selecao['media_atraso']*100:.1f}%
+        </div>
+        <div style="font-size: 1rem; opacity: 0.85;">
+            Atraso médio das viagens
+        </div>
     </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
 
 
-st.markdown("---")
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+        <div style="font-size: 2rem; font-weight: 800; margin-bottom: 8px;">
+            {resumo_selecao['clusters']}
+        </div>
+        <div style="font-size: 1rem; opacity: 0.85;">
+            Clusters identificados
+        </div>
+        """, unsafe_allow_html=True)
 
 
 # Abas
 
-aba = st.tabs([
-    "📉 Causa e Efeito",
-    "📌 Clusters PCA",
-    "📦 Comparação Direta",
-    "🗺️ Mapa Fundão",
-    "🏆 O Pódio da Lerdeza"
-])
+def mostrar_representacao(representacao):
+    # Indicador do modo agregado dos gráficos de dispersão (ver cocada.graficos)
+    if representacao["modo"] == "agregado":
+        st.caption(
+            f"⚡ {representacao['pontos']:,} pontos representados por "
+            f"{representacao['marcadores']:,} marcadores (agregação em grade por cluster, WebGL). "
+            "O tamanho de cada marcador indica quantos pontos ele resume."
+        )
+
+
+@st.cache_resource
+def cache_figuras():
+    # Figuras prontas, compartilhadas entre sessões: uma visão popular é
+    # montada uma vez só. Guardar o objeto (e não uma cópia serializada, como
+    # o st.cache_data faria) evita desserializar e revalidar a figura a cada
+    # rerun. O orçamento de memória vem da config "cache_figuras_mb".
+    return CacheLRU(limite_bytes=int(config.obter("cache_figuras_mb", 128)) * 1024 ** 2)
+
+
+def figura_em_cache(aba, versao, linhas, modo, calcular):
+    # A chave inclui tudo de que a figura depende; "modo" é o modo de
+    # renderização (exato/agregado) ou, no mapa, período e zoom
+    def montar():
+        with metricas.etapa("figura", aba=aba):
+            return calcular()
+    return cache_figuras().obter_ou_calcular((aba, versao, linhas, modo), montar)
+
+
+def mostrar_figura(aba, fig):
+    # O st.plotly_chart serializa a figura em JSON: é medido à parte da montagem
+    with metricas.etapa("plotly_chart", aba=aba):
+        st.plotly_chart(fig, use_container_width=True)
 
 
 # ======================================================================
@@ -442,7 +925,7 @@ aba = st.tabs([
 # ======================================================================
 
 
-with aba[0]:
+def aba_causa_efeito(df, df_filtrado, chave_linhas):
     st.header("📉 A Prova da Causa e Efeito")
    
     st.markdown("""
@@ -453,27 +936,13 @@ with aba[0]:
     </div>
     """, unsafe_allow_html=True)
    
-    fig_scatter = px.scatter(
-        df_filtrado,
-        x="tempo_total_fundao",
-        y="prop_atrasadas",
-        color="cluster_id",
-        size="velocidade_media_fundao",
-        hover_data=["linha", "data"],
-        title="Tempo no Fundão × Proporção de Atrasos",
-        color_discrete_sequence=px.colors.qualitative.Bold,
-        height=600,
-        labels={
-            "tempo_total_fundao": "Tempo Total no Fundão (minutos)",
-            "prop_atrasadas": "Proporção de Viagens Atrasadas",
-            "cluster_id": "Cluster"
-        }
+    fig_scatter, representacao = figura_em_cache(
+        "causa_efeito", versao_de(df), chave_linhas, modo_renderizacao(len(df_filtrado)),
+        lambda: figura_causa_efeito(df_filtrado),
     )
    
-    fig_scatter.update_layout(plot_bgcolor='white')
-    fig_scatter.update_traces(marker=dict(line=dict(width=1, color='DarkSlateGrey')))
-   
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    mostrar_figura("causa_efeito", fig_scatter)
+    mostrar_representacao(representacao)
    
     st.markdown("""
     <div class='warning-box'>
@@ -486,12 +955,12 @@ with aba[0]:
     """, unsafe_allow_html=True)
 
 
-    # ======================================================================
+# ======================================================================
 # ABA 2 – CLUSTERS PCA
 # ======================================================================
 
 
-with aba[1]:
+def aba_pca(df, df_filtrado, chave_linhas):
     st.header("📌 Mapa de Clusters – Análise PCA")
    
     st.markdown("""
@@ -502,26 +971,13 @@ with aba[1]:
     </div>
     """, unsafe_allow_html=True)
    
-    fig_pca = px.scatter(
-        df_filtrado,
-        x="pc1",
-        y="pc2",
-        color="cluster_id",
-        hover_data=["linha", "tempo_total_fundao", "prop_atrasadas"],
-        title="Distribuição dos Clusters no Espaço PCA",
-        color_discrete_sequence=px.colors.qualitative.Bold,
-        height=600,
-        labels={
-            "pc1": "Componente Principal 1",
-            "pc2": "Componente Principal 2",
-            "cluster_id": "Cluster"
-        }
+    fig_pca, representacao = figura_em_cache(
+        "pca", versao_de(df), chave_linhas, modo_renderizacao(len(df_filtrado)),
+        lambda: figura_pca(df_filtrado),
     )
    
-    fig_pca.update_layout(plot_bgcolor='white')
-    fig_pca.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
-   
-    st.plotly_chart(fig_pca, use_container_width=True)
+    mostrar_figura("pca", fig_pca)
+    mostrar_representacao(representacao)
 
 
 # ======================================================================
@@ -529,7 +985,7 @@ with aba[1]:
 # ======================================================================
 
 
-with aba[2]:
+def aba_comparacao(df, visao, linha_sel, chave_linhas):
     st.header("📦 Comparação Direta Entre Linhas")
    
     st.markdown("""
@@ -542,36 +998,20 @@ with aba[2]:
     if len(linha_sel) == 0:
         st.warning("⚠️ Selecione pelo menos uma linha no filtro lateral!")
     else:
-        ordem = df_filtrado.groupby("linha")["tempo_total_fundao"].median().sort_values(ascending=False).index
+        ordem = visao["ordem"]
        
-        fig_box = px.box(
-            df_filtrado,
-            x="linha",
-            y="tempo_total_fundao",
-            color="cluster_id",
-            title="Distribuição de Tempos por Linha (Box Plot)",
-            color_discrete_sequence=px.colors.qualitative.Bold,
-            height=600,
-            labels={
-                "linha": "Linha",
-                "tempo_total_fundao": "Tempo Total no Fundão (minutos)",
-                "cluster_id": "Cluster"
-            }
+        fig_box = figura_em_cache(
+            "comparacao", versao_de(df), chave_linhas, "box",
+            lambda: figura_box(visao["caixas"], ordem),
         )
        
-        fig_box.update_xaxes(categoryorder='array', categoryarray=ordem)
-        fig_box.update_layout(plot_bgcolor='white')
-       
-        st.plotly_chart(fig_box, use_container_width=True)
+        mostrar_figura("comparacao", fig_box)
        
         # Estatísticas comparativas
         if len(linha_sel) >= 2:
             st.subheader("📊 Comparação Estatística")
            
-            comparacao = df_filtrado.groupby("linha").agg({
-                "tempo_total_fundao": ["min", "median", "max", "sum"],
-                "prop_atrasadas": "mean"
-            }).round(2)
+            comparacao = visao["comparacao"].round(2)
            
             comparacao.columns = ['Mínimo (min)', 'Mediana (min)', 'Máximo (min)', 'Total Acumulado (min)', 'Prop. Atrasos']
             comparacao['Prop. Atrasos'] = (comparacao['Prop. Atrasos'] * 100).round(1).astype(str) + '%'
@@ -584,78 +1024,65 @@ with aba[2]:
 # ======================================================================
 
 
-@st.cache_data(show_spinner=True)
-def carregar_mapa():
-    # Autenticação direta
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
-    )
-    client = bigquery.Client(credentials=creds, project=BILLING_PROJECT_ID)
-
-    query_mapa = f"""
-    WITH classificacao_do_dia AS (
-        SELECT linha, data, centroid_id as cluster_id
-        FROM ML.PREDICT(MODEL `{BILLING_PROJECT_ID}.{DATASET_ID}.modelo_kmeans`,
-            (SELECT * FROM `{BILLING_PROJECT_ID}.{DATASET_ID}.tabela_resumo`))
-        WHERE data = '2025-10-15'
-    ),
-    pontos_gps AS (
-        SELECT 
-            servico as linha,
-            latitude,
-            longitude,
-            timestamp_gps
-        FROM `datario.transporte_rodoviario_municipal.gps_onibus`
-        WHERE data = '2025-10-15'
-          AND latitude BETWEEN -22.870 AND -22.838
-          AND longitude BETWEEN -43.250 AND -43.198
-    )
-    SELECT p.*, CAST(c.cluster_id AS STRING) as cluster_id
-    FROM pontos_gps p
-    JOIN classificacao_do_dia c ON p.linha = c.linha
-    LIMIT 5000
-    """
-    
-    job = client.query(query_mapa)
-    return job.to_dataframe(create_bqstorage_client=False)
-
-
 # ======================================================================
 # ABA 4 – MAPA
 # ======================================================================
 
 
-with aba[3]:
+@st.fragment
+def aba_mapa(df, linha_sel, chave_linhas, versao_dados):
+    # Fragmento próprio: mudar período ou zoom refaz só o mapa
     st.header("🗺️ Mapa de Circulação por Cluster – Fundão")
+
+    primeiro_dia, ultimo_dia = df["data"].min(), df["data"].max()
+    dia_padrao = carga.dia_mapa_padrao(primeiro_dia, ultimo_dia)
+
+    col_periodo, col_zoom = st.columns([2, 1])
+    with col_periodo:
+        periodo = st.date_input(
+            "📅 Período do mapa:",
+            value=(dia_padrao, dia_padrao),
+            min_value=primeiro_dia,
+            max_value=ultimo_dia,
+            help="Escolha um dia ou um intervalo de dias"
+        )
+    with col_zoom:
+        zoom = st.select_slider(
+            "🔍 Nível de zoom:",
+            options=list(FATORES_ZOOM),
+            value=ZOOM_PADRAO,
+            help="Zoom maior = células menores (mais detalhe)"
+        )
+
+    # Enquanto o intervalo está sendo escolhido o widget devolve só o início
+    inicio, fim = (periodo[0], periodo[-1]) if len(periodo) else (dia_padrao, dia_padrao)
    
     with st.spinner("🗺️ Carregando pontos GPS..."):
         try:
-            df_mapa = carregar_mapa()
+            df_celulas = com_reserva(
+                "mapa",
+                lambda: metricas.chamar_loader(
+                    "carregar_mapa", carregar_antecipado, "mapa", carregar_mapa, versao_dados, inicio, fim
+                ),
+                lambda: mapas_carregados().obter((inicio, fim)),
+                parar=False,
+            )
+            with metricas.etapa("grade_mapa"):
+                df_mapa = celulas_para_zoom(df_celulas, zoom, linha_sel)
            
             if len(df_mapa) > 0:
-                # Filtrar pelo que foi selecionado
-                if linha_sel:
-                    df_mapa = df_mapa[df_mapa["linha"].isin(linha_sel)]
-               
-                fig_map = px.scatter_mapbox(
-                    df_mapa,
-                    lat="latitude",
-                    lon="longitude",
-                    color="cluster_id",
-                    hover_name="linha",
-                    hover_data=["timestamp_gps"],
-                    zoom=13,
-                    height=700,
-                    color_discrete_sequence=px.colors.qualitative.Bold,
-                    title="Distribuição Espacial dos Clusters"
+                # Chave pela versão das células, não do resumo: a cópia de
+                # reserva e um mapa atualizado têm figuras próprias
+                fig_map = figura_em_cache(
+                    "mapa", versao_de(df_celulas), chave_linhas, (inicio, fim, zoom),
+                    lambda: figura_mapa(df_mapa, zoom),
                 )
-                fig_map.update_layout(
-                    mapbox_style="open-street-map",
-                    margin={"r":0,"t":40,"l":0,"b":0}
-                )
-                st.plotly_chart(fig_map, use_container_width=True)
+                mostrar_figura("mapa", fig_map)
                
-                st.info(f"📍 Exibindo {len(df_mapa):,} pontos GPS no mapa")
+                st.info(
+                    f"📍 {int(df_mapa['pontos'].sum()):,} pontos GPS resumidos em "
+                    f"{len(df_mapa):,} células da grade"
+                )
             else:
                 st.warning("⚠️ Nenhum dado de GPS disponível para a data/linhas selecionadas.")
         except Exception as e:
@@ -664,7 +1091,7 @@ with aba[3]:
 
 # ABA 5 – O Pódio
 
-with aba[4]:
+def aba_podio(cubo):
     st.header("🏆 O Podium da Vergonha: Linhas Mais Atrasadas")
    
     st.markdown("""
@@ -674,18 +1101,12 @@ with aba[4]:
     </div>
     """, unsafe_allow_html=True)
    
-    # Calcular ranking
-    linhas_com_dados = df.groupby("linha").size()
-    linhas_validas = linhas_com_dados[linhas_com_dados >= 5].index
-   
-    ranking_atrasos = df[df["linha"].isin(linhas_validas)].groupby("linha").agg({
-        "prop_atrasadas": ["mean", "std", "count"],
-        "tempo_total_fundao": ["mean", "sum"],
-        "velocidade_media_fundao": "mean"
-    })
-   
-    ranking_atrasos.columns = ['_'.join(col).strip() for col in ranking_atrasos.columns.values]
-    ranking_atrasos = ranking_atrasos.sort_values("prop_atrasadas_mean", ascending=False).head(10)
+    # Ranking (linhas com pelo menos 5 observações), lido do cubo de agregados
+    ranking_atrasos = cubo.ranking(minimo_observacoes=5, quantidade=10)
+    if ranking_atrasos.empty:
+        # Períodos curtos podem não ter nenhuma linha com 5 observações
+        st.warning("⚠️ Nenhuma linha tem pelo menos 5 observações no período escolhido. Escolha um período maior.")
+        return
    
     # Tabela completa do ranking
     st.subheader("📋 Top 10 Linhas Mais Atrasadas")
@@ -722,6 +1143,138 @@ with aba[4]:
     """, unsafe_allow_html=True)
 
 
+# ======================================================================
+# PAINEL DE DEPURAÇÃO (OPCIONAL)
+# ======================================================================
+# Ligado pela config "painel_debug". Mostra de onde veio o tempo da última
+# execução do painel, os acumulados do processo (BigQuery, loaders,
+# figuras...), acertos/faltas dos loaders em cache e o uso de memória.
+
+
+def memoria_da_sessao(df):
+    # Estado da sessão + a cópia do DataFrame que o st.cache_data entrega a
+    # cada sessão (no modo compartilhado todas usam o mesmo)
+    estado = sum(tamanho_em_bytes(valor) for valor in st.session_state.to_dict().values())
+    copia = 0 if config.obter_bool("compartilhar_memoria") else df.attrs["memoria_depois"]
+    return estado + copia
+
+
+def publicar_memoria(df, versao_dados):
+    memoria_sessao = memoria_da_sessao(df)
+    metricas.observar("memoria_sessao_bytes", memoria_sessao)
+    for nome, cache in (("filtros", cache_filtros()), ("figuras", cache_figuras()), ("selecoes", cache_selecoes(versao_dados))):
+        for campo, valor in cache.estatisticas().items():
+            metricas.definir(f"cache_{campo}", valor, cache=nome)
+    pico = metricas.memoria_processo_pico()
+    if pico is not None:
+        metricas.definir("memoria_processo_pico_bytes", pico)
+    return memoria_sessao
+
+
+def mostrar_depuracao(execucao_painel, memoria_sessao, versao_dados):
+    with st.sidebar.expander("🛠️ Depuração", expanded=True):
+        st.caption(
+            f"Última execução do painel: {execucao_painel.duracao * 1000:,.0f} ms · "
+            f"memória da sessão: {memoria_sessao / 1024 ** 2:.2f} MB"
+        )
+        st.dataframe(pd.DataFrame({
+            "Etapa": list(execucao_painel.etapas),
+            "ms": [duracao * 1000 for duracao in execucao_painel.etapas.values()],
+        }).round(1), hide_index=True, use_container_width=True)
+
+        st.markdown("**Acumulado do processo**")
+        etapas = pd.DataFrame.from_dict(metricas.REGISTRO.tabela_etapas(), orient="index")
+        if not etapas.empty:
+            st.dataframe(pd.DataFrame({
+                "Execuções": etapas["contagem"],
+                "Média (ms)": etapas["soma"] / etapas["contagem"] * 1000,
+                "Última (ms)": etapas["ultimo"] * 1000,
+                "Máx. (ms)": etapas["maximo"] * 1000,
+            }).sort_index().round(1), use_container_width=True)
+
+        st.markdown("**Loaders em cache**")
+        loaders = pd.DataFrame(metricas.REGISTRO.tabela_contador("cache_loader_total"))
+        if not loaders.empty:
+            st.dataframe(
+                loaders.pivot_table(index="loader", columns="resultado", values="valor", fill_value=0),
+                use_container_width=True,
+            )
+
+        st.markdown("**Caches LRU**")
+        st.dataframe(pd.DataFrame({
+            "filtros": cache_filtros().estatisticas(),
+            "figuras": cache_figuras().estatisticas(),
+            "selecoes": cache_selecoes(versao_dados).estatisticas(),
+        }), use_container_width=True)
+
+        st.markdown("**Atualização dos dados**")
+        st.json(atualizador().estado(), expanded=False)
+
+
+# ======================================================================
+# PAINEL FILTRADO (FRAGMENTO)
+# ======================================================================
+# Tudo o que depende do filtro de linhas (cards, figuras, tabela de
+# comparação, mapa) fica neste fragmento. Mexer no filtro ou trocar de aba
+# reexecuta só ele: o CSS, o cabeçalho, o questionário e a sidebar de
+# respostas não são refeitos nem reenviados ao navegador.
+
+
+@st.fragment
+def painel_analise(df, cubo, versao_dados):
+    execucao_painel = metricas.iniciar_execucao("painel", sessao=st.session_state.id_sessao)
+
+    linhas = sorted(df["linha"].unique())
+    # Escrito na sidebar a partir do fragmento: interagir com o filtro
+    # reexecuta este fragmento, não o script inteiro
+    linha_sel = st.sidebar.multiselect(
+        "📍 Selecione as linhas:",
+        linhas,
+        default=linhas,
+        help="Escolha uma ou mais linhas para análise detalhada"
+    )
+
+    visao = visao_filtrada(df, cubo, linha_sel)
+    chave_linhas = tuple(sorted(linha_sel))
+
+    mostrar_cards(visao["resumo_selecao"])
+
+    st.markdown("---")
+
+    # Com on_change="rerun" cada aba sabe se está aberta (.open): só a aba
+    # visível carrega dados, agrega e monta figuras
+    aba = st.tabs([
+        "📉 Causa e Efeito",
+        "📌 Clusters PCA",
+        "📦 Comparação Direta",
+        "🗺️ Mapa Fundão",
+        "🏆 O Pódio da Lerdeza"
+    ], on_change="rerun", key="aba_ativa")
+
+    if aba[0].open:
+        with aba[0]:
+            aba_causa_efeito(df, visao["df_filtrado"], chave_linhas)
+    if aba[1].open:
+        with aba[1]:
+            aba_pca(df, visao["df_filtrado"], chave_linhas)
+    if aba[2].open:
+        with aba[2]:
+            aba_comparacao(df, visao, linha_sel, chave_linhas)
+    if aba[3].open:
+        with aba[3]:
+            aba_mapa(df, linha_sel, chave_linhas, versao_dados)
+    if aba[4].open:
+        with aba[4]:
+            aba_podio(cubo)
+
+    execucao_painel.finalizar()
+    if config.obter_bool("painel_debug"):
+        mostrar_depuracao(execucao_painel, memoria_da_sessao(df), versao_dados)
+
+
+painel_analise(df, cubo, versao_dados)
+
+
 # FOOTER
 
 
@@ -734,3 +1287,5 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+
+execucao.finalizar(memoria_sessao_bytes=publicar_memoria(df, versao_dados))